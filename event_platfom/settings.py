@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'events.middleware.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -51,6 +53,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request query counts and DB time go to the 'events.middleware' logger;
+# the Server-Timing header exposes them to the browser, so keep it to DEBUG.
+QUERY_TIMING_HEADER = DEBUG
+QUERY_DUPLICATE_WARNING_THRESHOLD = 5
+
 
 AUTH_USER_MODEL = 'events.CustomUser'
 
@@ -68,6 +75,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'events.context_processors.notifications',
             ],
         },
     },
@@ -82,9 +90,27 @@ WSGI_APPLICATION = 'event_platfom.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+        # On disk, so processes a test starts (run_jobs) can open it too.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+
+# Cache
+# Unread counts, page and card caches, locks and notification broker
+# counters live here, so every process must share it: web workers and
+# run_jobs alike. The file cache is shared by the processes on one host;
+# use Redis or Memcached when running on several.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', BASE_DIR / '.cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
+# Tests run against a cache directory of their own (see events.test_runner).
+TEST_RUNNER = 'events.test_runner.TestRunner'
 
 
 # Password validation
@@ -117,7 +143,6 @@ USE_I18N = True
 
 USE_TZ = True
 
-import os
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
@@ -129,6 +154,30 @@ STATICFILES_DIRS = [
 # Media files (user uploaded content)
 MEDIA_URL = '/media/'  # The URL that handles the media served from MEDIA_ROOT
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') 
+# MEDIA_URL is served by events.views.serve_media. To have the front proxy
+# send the bytes, set MEDIA_OFFLOAD to 'x-accel-redirect' (nginx, with an
+# internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT)
+# or 'x-sendfile' (Apache mod_xsendfile, lighttpd).
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Threads generating WebP derivatives of uploaded images (events.images);
+# defaults to the CPU count.
+IMAGE_DERIVATIVE_WORKERS = None
+
+# Ticket numbers
+# Pluggable generator used for every issued ticket. The Snowflake generator
+# needs a node id (0-1023) unique to each worker process, across all hosts.
+# Unless TICKET_NUMBER_NODE_ID pins one, each process leases a free id from
+# the database (events.TicketNumberNode) on its first purchase.
+TICKET_NUMBER_GENERATOR = 'events.ticket_numbers.SnowflakeGenerator'
+TICKET_NUMBER_NODE_ID = os.environ.get('TICKET_NUMBER_NODE_ID') or None
+
+# Notification streams
+# Wakes a user's open notification streams when a notification is created.
+# The cache broker reaches streams in every process sharing the cache,
+# including notifications sent by run_jobs; streams also re-check the
+# database every 15 seconds.
+NOTIFICATION_BROKER = 'events.live.CacheBroker'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import (
-    CustomUser, Event, EventCategory, Ticket, EventComment, Notification
+    CustomUser, Event, EventCategory, Ticket, EventComment, Notification, Job
 )
+from .notifications import invalidate_unread_counts
 
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'user_type', 'is_staff', 'date_joined')
@@ -23,13 +24,13 @@ class CustomUserAdmin(UserAdmin):
     )
 
 class EventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'organizer', 'start_date', 'end_date', 'location', 'event_type', 'is_active')
+    list_display = ('title', 'organizer', 'start_date', 'end_date', 'location', 'event_type', 'tickets_sold', 'is_active')
     list_filter = ('event_type', 'is_active', 'category', 'start_date')
     search_fields = ('title', 'description', 'location', 'organizer__username')
     date_hierarchy = 'start_date'
     raw_id_fields = ('organizer',)
     list_editable = ('is_active',)
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'tickets_sold', 'comment_count', 'rating_count', 'rating_sum')
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -43,6 +44,12 @@ class TicketAdmin(admin.ModelAdmin):
     search_fields = ('ticket_number', 'event__title', 'attendee__username')
     raw_id_fields = ('event', 'attendee')
     readonly_fields = ('purchase_date', 'ticket_number')
+    actions = ['deactivate_tickets']
+
+    def deactivate_tickets(self, request, queryset):
+        count = queryset.deactivate()
+        self.message_user(request, f"{count} ticket(s) deactivated.")
+    deactivate_tickets.short_description = "Deactivate selected tickets"
 
 class EventCommentAdmin(admin.ModelAdmin):
     list_display = ('user', 'event', 'rating', 'created_at')
@@ -58,12 +65,21 @@ class NotificationAdmin(admin.ModelAdmin):
     actions = ['mark_as_read']
     
     def mark_as_read(self, request, queryset):
+        user_ids = list(queryset.filter(is_read=False).values_list('user_id', flat=True).distinct())
         queryset.update(is_read=True)
+        invalidate_unread_counts(user_ids)
     mark_as_read.short_description = "Mark selected notifications as read"
 
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'status', 'progress', 'total', 'attempts', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    raw_id_fields = ('created_by',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'error')
+
 admin.site.register(CustomUser, CustomUserAdmin)
 admin.site.register(Event, EventAdmin)
 admin.site.register(EventCategory)
 admin.site.register(Ticket, TicketAdmin)
 admin.site.register(EventComment, EventCommentAdmin)
-admin.site.register(Notification, NotificationAdmin)
\ No newline at end of file
+admin.site.register(Notification, NotificationAdmin)
+admin.site.register(Job, JobAdmin)
\ No newline at end of file
@@ -0,0 +1,112 @@
+import asyncio
+import math
+import time
+
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from .models import CustomUser, Event, EventComment, Notification
+from .urls import urlpatterns
+
+# Routes that change state on GET, need tokens a benchmark can't produce, or
+# stream until the client disconnects.
+SKIPPED_ROUTES = {
+    'logout', 'mark_notification_read', 'mark_all_notifications_read', 'password_reset_confirm',
+    'event_availability', 'notification_stream', 'image_derivative',
+}
+
+
+def percentile(samples, percent):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(timings, queries, statuses):
+    milliseconds = [timing * 1000 for timing in timings]
+    return {
+        'requests': len(timings),
+        'p50_ms': round(percentile(milliseconds, 50), 2),
+        'p95_ms': round(percentile(milliseconds, 95), 2),
+        'p99_ms': round(percentile(milliseconds, 99), 2),
+        'mean_ms': round(sum(milliseconds) / len(milliseconds), 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'statuses': {str(status): statuses.count(status) for status in sorted(set(statuses))},
+    }
+
+
+def find_targets(prefix='bench'):
+    # One URL per route, filled in with rows from the seeded data set; the
+    # first seeded event belongs to '<prefix>-admin'.
+    admin = CustomUser.objects.get(username=f'{prefix}-admin')
+    attendee = CustomUser.objects.filter(username__startswith=f'{prefix}-user-', tickets__isnull=False).first()
+    event = Event.objects.filter(organizer=admin).order_by('pk').first()
+    kwargs_by_prefix = {
+        'comments/': {'pk': EventComment.objects.filter(user=attendee).values_list('pk', flat=True).first()},
+        'notifications/': {'pk': Notification.objects.filter(user=attendee).values_list('pk', flat=True).first()},
+        'events/': {'pk': event.pk if event else None},
+    }
+    targets = []
+    for pattern in urlpatterns:
+        if pattern.name in SKIPPED_ROUTES:
+            continue
+        route = str(pattern.pattern)
+        kwargs = {}
+        if '<int:pk>' in route:
+            kwargs = next(value for key, value in kwargs_by_prefix.items() if route.startswith(key))
+            if kwargs['pk'] is None:
+                continue
+        targets.append((pattern.name, reverse(pattern.name, kwargs=kwargs)))
+    return {'anonymous': None, 'attendee': attendee, 'admin': admin}, targets
+
+
+def run_sync(users, targets, requests, warmup=2):
+    results = {}
+    for identity, user in users.items():
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        for name, url in targets:
+            timings, queries, statuses = [], [], []
+            for attempt in range(warmup + requests):
+                started = time.perf_counter()
+                response = client.get(url)
+                elapsed = time.perf_counter() - started
+                if attempt < warmup:
+                    continue
+                timings.append(elapsed)
+                statuses.append(response.status_code)
+                if hasattr(response, 'query_stats'):
+                    queries.append(response.query_stats.count)
+            results[f'{identity} {name}'] = summarize(timings, queries, statuses)
+    return results
+
+
+async def run_asgi(users, targets, requests, concurrency=10, warmup=2):
+    # Through the ASGI handler, with up to ``concurrency`` requests to the
+    # same route in flight at once.
+    results = {}
+    for identity, user in users.items():
+        client = AsyncClient()
+        if user is not None:
+            await client.aforce_login(user)
+        for name, url in targets:
+            for _ in range(warmup):
+                await client.get(url)
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def fetch():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.get(url)
+                    return time.perf_counter() - started, response
+
+            responses = await asyncio.gather(*(fetch() for _ in range(requests)))
+            results[f'{identity} {name}'] = summarize(
+                [elapsed for elapsed, _ in responses],
+                [response.query_stats.count for _, response in responses if hasattr(response, 'query_stats')],
+                [response.status_code for _, response in responses],
+            )
+    return results
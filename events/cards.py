@@ -0,0 +1,74 @@
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import get_template
+
+# Event cards are rendered from the event alone, without the request, so a
+# card rendered for one page and visitor serves every other. A card's key
+# is made of what it shows: updated_at covers edits, and each style adds
+# the fields it renders that change without a save(), such as tickets_sold
+# standing in for an availability version, since cards with the same count
+# are identical.
+CARD_TEMPLATES = {
+    'home': 'events/cards/home.html',
+    'list': 'events/cards/list.html',
+    'my_events': 'events/cards/my_events.html',
+    'dashboard': 'events/cards/dashboard.html',
+}
+# Per style: the fields and view annotations it shows beyond updated_at.
+# category_id is there because deleting a category clears it without a save().
+CARD_VERSION_FIELDS = {
+    'home': (),
+    'list': ('tickets_sold', 'rating_count', 'rating_sum', 'category_id', 'search_snippet'),
+    'my_events': ('category_id',),
+    'dashboard': ('tickets_held',),
+}
+# Bounds how long a renamed category shows on cards.
+CARD_TIMEOUT = 60 * 60
+HITS_KEY = 'events:card-cache:hits'
+MISSES_KEY = 'events:card-cache:misses'
+
+
+def card_key(style, event):
+    version = [getattr(event, name, None) for name in CARD_VERSION_FIELDS[style]]
+    digest = hashlib.md5(repr(version).encode(), usedforsecurity=False).hexdigest()
+    return f'events:card:{style}:{event.pk}:{event.updated_at.timestamp()}:{digest}'
+
+
+def render_cards(style, events):
+    # One get_many() for the page's cards; misses are rendered and stored
+    # with one set_many().
+    keys = [card_key(style, event) for event in events]
+    cached = cache.get_many(keys)
+    template = get_template(CARD_TEMPLATES[style])
+    rendered = {}
+    cards = []
+    for key, event in zip(keys, events):
+        card = cached.get(key)
+        if card is None:
+            card = rendered[key] = template.render({'event': event})
+        cards.append(card)
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+    count_cards(len(cards) - len(rendered), len(rendered))
+    return cards
+
+
+def count_cards(hits, misses):
+    for key, count in ((HITS_KEY, hits), (MISSES_KEY, misses)):
+        if not count:
+            continue
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            cache.add(key, count, None)
+
+
+def get_card_cache_stats():
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counts.get(HITS_KEY, 0), counts.get(MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits + misses else None,
+    }
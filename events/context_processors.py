@@ -0,0 +1,10 @@
+from .notifications import get_unread_count
+
+
+def notifications(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'unread_notifications_count': 0}
+    if not hasattr(request, '_unread_notifications_count'):
+        request._unread_notifications_count = get_unread_count(user)
+    return {'unread_notifications_count': request._unread_notifications_count}
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from .models import CustomUser, Event
+
+# Derivatives are WebP renditions of an uploaded image at a fixed set of
+# widths. They are named after the SHA-256 of the upload, so identical
+# uploads share them, and are written to DERIVATIVE_DIR under MEDIA_ROOT
+# the first time they are needed.
+DERIVATIVE_DIR = 'derivatives'
+WEBP_QUALITY = 80
+IMAGE_PRESETS = {
+    'card': {'widths': (320, 640, 960), 'sizes': '(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw'},
+    'banner': {'widths': (640, 960, 1280, 1920), 'sizes': '(min-width: 768px) 66vw, 100vw'},
+    # Rendered at a fixed size, given to the tag as width=.
+    'avatar': {'widths': (64, 128, 256), 'sizes': None},
+}
+DERIVATIVE_WIDTHS = sorted({width for preset in IMAGE_PRESETS.values() for width in preset['widths']})
+# How long a request waits for a derivative that is still being generated.
+GENERATE_TIMEOUT = 30
+# The image field of each model, and the field holding its hash.
+HASHED_IMAGES = {
+    Event: ('image', 'image_hash'),
+    CustomUser: ('profile_picture', 'profile_picture_hash'),
+}
+
+
+def content_hash(field_file):
+    if not field_file:
+        return ''
+    digest = hashlib.sha256()
+    committed = field_file._committed
+    for chunk in field_file.chunks():
+        digest.update(chunk)
+    if committed:
+        field_file.close()
+    return digest.hexdigest()
+
+
+def derivative_name(digest, width):
+    return f'{DERIVATIVE_DIR}/{digest[:2]}/{digest}-{width}.webp'
+
+
+def derivative_url(digest, width):
+    return reverse('image_derivative', args=[digest, width])
+
+
+def render_derivative(source, width):
+    with Image.open(source) as image:
+        # Lets JPEG decode straight to a reduced size.
+        image.draft('RGB', (width, width))
+        # Orientation lives in the EXIF data that is about to be dropped.
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+        image.thumbnail((width, image.height), Image.LANCZOS, reducing_gap=3.0)
+        output = BytesIO()
+        # Nothing from image.info is passed on, so EXIF, XMP and ICC
+        # metadata are left behind.
+        image.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return output.getvalue()
+
+
+def generate_derivative(source_name, digest, width):
+    path = default_storage.path(derivative_name(digest, width))
+    if os.path.exists(path):
+        return path
+    with default_storage.open(source_name, 'rb') as source:
+        data = render_derivative(source, width)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written aside and renamed, so readers never see a partial file.
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return path
+
+
+_executor = None
+_pending = {}
+# Reentrant: add_done_callback() runs the callback at once if the future
+# has already finished.
+_lock = threading.RLock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', None) or os.cpu_count() or 2
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-derivatives')
+    return _executor
+
+
+def submit_derivative(source_name, digest, width):
+    # One generation per derivative at a time, however many requests ask.
+    key = (digest, width)
+    with _lock:
+        future = _pending.get(key)
+        if future is None:
+            future = _pending[key] = get_executor().submit(generate_derivative, source_name, digest, width)
+            future.add_done_callback(lambda done: _forget(key, done))
+    return future
+
+
+def _forget(key, future):
+    with _lock:
+        if _pending.get(key) is future:
+            del _pending[key]
+
+
+def prewarm_derivatives(source_name, digest, widths=DERIVATIVE_WIDTHS):
+    for width in widths:
+        if not os.path.exists(default_storage.path(derivative_name(digest, width))):
+            submit_derivative(source_name, digest, width)
+
+
+def find_source(digest):
+    for model, (field, hash_field) in HASHED_IMAGES.items():
+        name = model.objects.filter(**{hash_field: digest}).exclude(**{field: ''}).values_list(field, flat=True).first()
+        if name:
+            return name
+    return None
+
+
+def get_derivative(digest, width):
+    # The path of the derivative, generated now if need be; None when no
+    # upload has this hash.
+    path = default_storage.path(derivative_name(digest, width))
+    if os.path.exists(path):
+        return path
+    source_name = find_source(digest)
+    if source_name is None:
+        return None
+    return submit_derivative(source_name, digest, width).result(GENERATE_TIMEOUT)
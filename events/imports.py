@@ -0,0 +1,146 @@
+import csv
+import hashlib
+import json
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.utils import timezone
+
+from .forms import EventForm
+from .models import CustomUser, Event, EventCategory, Job
+from .search import get_search_backend
+from .stats import record_created_events
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_FORMATS = ('csv', 'jsonl')
+IMPORT_DEFAULTS = {'event_type': 'public', 'price': '0'}
+
+
+class EventImportForm(EventForm):
+    # EventForm's validation, minus the browser-only date format and the
+    # fields that are resolved from lookup maps.
+    start_date = forms.DateTimeField()
+    end_date = forms.DateTimeField()
+
+    class Meta(EventForm.Meta):
+        fields = ['title', 'description', 'location', 'start_date', 'end_date', 'event_type', 'capacity', 'price']
+
+
+def guess_format(path):
+    return 'jsonl' if str(path).lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_rows(path, import_format):
+    # Yields one dict per row, or the ValueError for a JSON line that could
+    # not be decoded, so row numbers stay stable for resuming.
+    with open(path, newline='', encoding='utf-8') as f:
+        if import_format == 'csv':
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield e
+                continue
+            yield row if isinstance(row, dict) else ValueError("Expected a JSON object.")
+
+
+def error_messages(form):
+    return [
+        message if field == '__all__' else f"{field}: {message}"
+        for field, messages in form.errors.items()
+        for message in messages
+    ]
+
+
+class EventImporter:
+    def __init__(self, job, on_error=None, on_batch=None):
+        self.job = job
+        self.path = job.payload['path']
+        self.import_format = job.payload.get('format') or guess_format(self.path)
+        self.batch_size = job.payload.get('batch_size') or IMPORT_BATCH_SIZE
+        self.default_organizer = job.payload.get('organizer')
+        self.on_error = on_error or (lambda row_number, messages: None)
+        self.on_batch = on_batch or (lambda job: None)
+        # One query each instead of one per row.
+        self.categories = {
+            name.casefold(): pk for pk, name in EventCategory.objects.values_list('pk', 'name')
+        }
+        self.organizers = dict(
+            CustomUser.objects.filter(user_type__in=[2, 3]).values_list('username', 'pk')
+        )
+
+    def build(self, row):
+        if isinstance(row, Exception):
+            raise ValidationError(str(row))
+        row = {key: value for key, value in row.items() if key is not None}
+        messages = []
+        username = row.get('organizer') or self.default_organizer
+        organizer_id = self.organizers.get(username)
+        if organizer_id is None:
+            messages.append(f"organizer: Unknown organizer '{username}'.")
+        category = (row.get('category') or '').strip()
+        category_id = self.categories.get(category.casefold()) if category else None
+        if category and category_id is None:
+            messages.append(f"category: Unknown category '{category}'.")
+
+        data = {**IMPORT_DEFAULTS, **{key: value for key, value in row.items() if value not in (None, '')}}
+        form = EventImportForm(data, instance=Event(organizer_id=organizer_id, category_id=category_id))
+        if not form.is_valid():
+            messages.extend(error_messages(form))
+        if messages:
+            raise ValidationError(messages)
+        return form.instance
+
+    def run(self):
+        # Each batch is inserted in the same transaction that advances the
+        # job's checkpoint, so a rerun skips exactly the rows already stored.
+        checkpoint = self.job.checkpoint or {}
+        done = checkpoint.get('row', 0)
+        self.created = checkpoint.get('created', 0)
+        self.rejected = checkpoint.get('rejected', 0)
+        batch = []
+        row_number = 0
+        for row_number, row in enumerate(read_rows(self.path, self.import_format), start=1):
+            if row_number <= done:
+                continue
+            try:
+                batch.append(self.build(row))
+            except ValidationError as e:
+                self.rejected += 1
+                self.on_error(row_number, e.messages)
+            if row_number - done >= self.batch_size:
+                self.flush(batch, row_number)
+                batch, done = [], row_number
+        if row_number > done:
+            self.flush(batch, row_number)
+        Job.objects.filter(pk=self.job.pk).update(total=row_number)
+        return self.created
+
+    def flush(self, events, row_number):
+        with transaction.atomic():
+            Event.objects.bulk_create(events)
+            record_created_events(events)
+            self.created += len(events)
+            self.job.progress = row_number
+            self.job.checkpoint = {'row': row_number, 'created': self.created, 'rejected': self.rejected}
+            # bulk_create() skips post_save, so index the new events here.
+            get_search_backend(router.db_for_write(Event)).index_events(events)
+            # started_at doubles as a heartbeat, so requeue_stale_jobs() only
+            # takes back imports that stopped checkpointing, not long ones.
+            Job.objects.filter(pk=self.job.pk).update(
+                progress=self.job.progress, checkpoint=self.job.checkpoint, started_at=timezone.now()
+            )
+        self.on_batch(self.job)
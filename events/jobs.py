@@ -0,0 +1,205 @@
+import logging
+import traceback
+
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.formats import date_format
+
+from .imports import EventImporter
+from .models import Event, Job, Notification, Ticket
+from .notifications import announce_notifications, invalidate_unread_counts
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+FAN_OUT_BATCH_SIZE = 1000
+
+_handlers = {}
+
+
+def job_handler(kind):
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, created_by=None, **payload):
+    return Job.objects.create(kind=kind, created_by=created_by, payload=payload)
+
+
+def claim_next_job():
+    with transaction.atomic():
+        pending = Job.objects.filter(status='pending').order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        job = pending.first()
+        if job is None:
+            return None
+        # The conditional update makes the claim safe on backends without
+        # SKIP LOCKED: only one worker can move the row out of 'pending'.
+        claimed = Job.objects.filter(pk=job.pk, status='pending').update(
+            status='running',
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs(older_than):
+    cutoff = timezone.now() - older_than
+    return Job.objects.filter(status='running', started_at__lt=cutoff).update(status='pending')
+
+
+def run_job(job):
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'.")
+        handler(job)
+    except Exception:
+        logger.exception("Job %s failed", job.pk)
+        status = 'pending' if handler is not None and job.attempts < MAX_ATTEMPTS else 'failed'
+        Job.objects.filter(pk=job.pk).update(status=status, error=traceback.format_exc())
+        return False
+    Job.objects.filter(pk=job.pk).update(status='done', error='', finished_at=timezone.now())
+    return True
+
+
+def run_pending_jobs(limit=None):
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def fan_out_notifications(job, recipients, notification_type, message, related_event,
+                          batch_size=FAN_OUT_BATCH_SIZE):
+    # One notification per distinct user id in ``recipients``, written in
+    # batches. Progress and the last user id are committed with each batch,
+    # so a retried job resumes where it stopped instead of notifying twice.
+    recipients = recipients.order_by('attendee_id').distinct()
+    last_user_id = (job.checkpoint or {}).get('last_user_id')
+    if job.total is None:
+        job.total = recipients.count()
+        Job.objects.filter(pk=job.pk).update(total=job.total)
+    if last_user_id is not None:
+        recipients = recipients.filter(attendee_id__gt=last_user_id)
+
+    def flush(user_ids):
+        with transaction.atomic():
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id,
+                    notification_type=notification_type,
+                    message=message,
+                    related_event=related_event
+                )
+                for user_id in user_ids
+            ])
+            job.progress += len(user_ids)
+            job.checkpoint = {'last_user_id': user_ids[-1]}
+            Job.objects.filter(pk=job.pk).update(progress=job.progress, checkpoint=job.checkpoint)
+        invalidate_unread_counts(user_ids)
+        announce_notifications(user_ids)
+
+    batch = []
+    for user_id in recipients.iterator(chunk_size=batch_size):
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return job.progress
+
+
+@job_handler('event_cancellation')
+def notify_event_cancellation(job):
+    event = Event.objects.select_related('organizer').get(pk=job.payload['event_id'])
+    active_tickets = Ticket.objects.filter(event=event, is_active=True)
+    notified = fan_out_notifications(
+        job,
+        active_tickets.values_list('attendee_id', flat=True),
+        'event_cancellation',
+        f"The event '{event.title}' has been cancelled.",
+        event
+    )
+    active_tickets.deactivate()
+    Notification.objects.create(
+        user=event.organizer,
+        notification_type='event_cancellation',
+        message=f"Cancellation notices for '{event.title}' were sent to {notified} attendee(s).",
+        related_event=event
+    )
+
+
+def describe_value(value):
+    if isinstance(value, datetime):
+        return date_format(timezone.localtime(value), 'M d, Y H:i')
+    if isinstance(value, Decimal):
+        return f"${value}"
+    return str(value)
+
+
+def enqueue_event_update(event, changes, created_by=None):
+    # ``changes`` maps field name -> (old, new) display strings. Edits made
+    # before the worker gets to the event are merged into the pending job,
+    # keeping the oldest "old" value, so attendees get one coalesced notice.
+    with transaction.atomic():
+        pending = Job.objects.select_for_update().filter(
+            kind='event_update',
+            status='pending',
+            payload__event_id=event.pk
+        ).first()
+        merged = dict(pending.payload['changes']) if pending else {}
+        for field, (old, new) in changes.items():
+            if field in merged:
+                old = merged[field][0]
+            merged[field] = [old, new]
+        merged = {field: values for field, values in merged.items() if values[0] != values[1]}
+
+        if pending is None:
+            return enqueue('event_update', created_by=created_by, event_id=event.pk, changes=merged) if merged else None
+        if not merged:
+            pending.delete()
+            return None
+        pending.payload['changes'] = merged
+        pending.save(update_fields=['payload'])
+        return pending
+
+
+@job_handler('event_update')
+def notify_event_update(job):
+    event = Event.objects.get(pk=job.payload['event_id'])
+    if not event.is_active:
+        return
+    details = '; '.join(
+        f"{Event._meta.get_field(field).verbose_name} changed from {old} to {new}"
+        for field, (old, new) in job.payload['changes'].items()
+    )
+    fan_out_notifications(
+        job,
+        Ticket.objects.filter(event=event, is_active=True).values_list('attendee_id', flat=True),
+        'event_update',
+        f"The event '{event.title}' has been updated: {details}.",
+        event
+    )
+
+
+@job_handler('event_import')
+def import_events(job):
+    # Normally run inline by the import_events command; a worker picks the job
+    # up (and resumes from its checkpoint) if that process died mid-import.
+    EventImporter(job).run()
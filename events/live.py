@@ -0,0 +1,241 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+# Subscribers are pushed at most one value per PUSH_INTERVAL seconds, however
+# often their topic is published to.
+PUSH_INTERVAL = 0.5
+KEEPALIVE_INTERVAL = 15
+# How often CacheBroker looks for publishes from other processes.
+BROKER_POLL_INTERVAL = 1
+
+
+def sse_message(data, event=None, id=None):
+    lines = []
+    if id is not None:
+        lines.append(f'id: {id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Topic:
+    def __init__(self, key):
+        self.key = key
+        self.version = 0
+        self.subscriptions = set()
+        # (version, value) of the last read, and the read in flight.
+        self.snapshot = None
+        self.reading = None
+        # Loop time before which no new read starts.
+        self.next_read = 0
+
+
+class Subscription:
+    def __init__(self, broker, topic):
+        self.broker = broker
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        try:
+            self.loop.call_soon_threadsafe(self.changed.set)
+        except RuntimeError:
+            # The subscriber's loop has closed.
+            self.broker.unsubscribe(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.unsubscribe(self)
+
+    async def wait(self, timeout=None):
+        # True once the topic was published to since the last wait(), False
+        # after ``timeout`` seconds without.
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.changed.clear()
+        return True
+
+    async def values(self, read, keepalive=KEEPALIVE_INTERVAL):
+        # Yields the current value, then the latest value after each change,
+        # or None when nothing changed for ``keepalive`` seconds.
+        yield await self.broker.current(self.topic, read)
+        while True:
+            if not await self.wait(keepalive):
+                yield None
+                continue
+            # Reads follow the topic's schedule rather than each
+            # subscriber's, so subscribers woken together read together.
+            delay = self.topic.next_read - self.loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.changed.clear()
+            # Anything published after this is signalled again, so a read
+            # that started since is recent enough.
+            version = self.topic.version
+            yield await self.broker.current(self.topic, read, version)
+
+
+class BaseBroker:
+    # NOTIFICATION_BROKER interface. publish(key) may be called from any
+    # thread; subscribe(key) returns an async context manager whose
+    # wait(timeout) returns True once key was published to since the last
+    # wait(). Nothing but the key is carried: subscribers read what changed
+    # from the database.
+    def publish(self, key):
+        raise NotImplementedError
+
+    def subscribe(self, key):
+        raise NotImplementedError
+
+
+class InMemoryBroker(BaseBroker):
+    # Publish/subscribe within one process. Subscribers are woken on their
+    # own event loop, and values() re-reads at most once per interval, so a
+    # burst of publishes costs each subscriber one push per interval; all
+    # subscribers of a topic share one read.
+    def __init__(self, interval=PUSH_INTERVAL):
+        self.interval = interval
+        self.topics = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, key):
+        with self.lock:
+            topic = self.topics.get(key)
+            if topic is None:
+                topic = self.topics[key] = Topic(key)
+            subscription = Subscription(self, topic)
+            topic.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            topic = subscription.topic
+            topic.subscriptions.discard(subscription)
+            if not topic.subscriptions and self.topics.get(topic.key) is topic:
+                del self.topics[topic.key]
+
+    def subscriber_count(self, key):
+        topic = self.topics.get(key)
+        return len(topic.subscriptions) if topic else 0
+
+    def publish(self, key):
+        with self.lock:
+            topic = self.topics.get(key)
+            if topic is None:
+                return
+            topic.version += 1
+            subscriptions = list(topic.subscriptions)
+        for subscription in subscriptions:
+            subscription.notify()
+
+    async def current(self, topic, read, version=None):
+        if version is None:
+            version = topic.version
+        if topic.snapshot and topic.snapshot[0] >= version:
+            return topic.snapshot[1]
+        reading = topic.reading
+        loop = asyncio.get_running_loop()
+        if reading is None or reading[0] < version or reading[1].get_loop() is not loop:
+            # Started after the publish, so the read sees that change.
+            reading = topic.reading = (topic.version, asyncio.ensure_future(read(topic.key)))
+            topic.next_read = loop.time() + self.interval
+        try:
+            value = await asyncio.shield(reading[1])
+        except Exception:
+            if topic.reading is reading:
+                topic.reading = None
+            raise
+        if not topic.snapshot or topic.snapshot[0] < reading[0]:
+            topic.snapshot = (reading[0], value)
+        return value
+
+
+class CacheBroker(InMemoryBroker):
+    # Carries publishes between processes (web workers, run_jobs) through a
+    # per-key counter in the default cache. Each process polls the counters
+    # of the keys it has subscribers for and wakes them locally on a change.
+    def __init__(self, interval=PUSH_INTERVAL, poll_interval=BROKER_POLL_INTERVAL):
+        super().__init__(interval)
+        self.poll_interval = poll_interval
+        self.seen = {}
+        self.poller = None
+
+    def counter_key(self, key):
+        return f'events:broker:{key}'
+
+    def publish(self, key):
+        counter = self.counter_key(key)
+        try:
+            cache.incr(counter)
+        except ValueError:
+            if not cache.add(counter, 1, None):
+                cache.incr(counter)
+        # Local subscribers are woken now; the poller wakes them once more
+        # when it sees the new count, which only costs them a re-read.
+        super().publish(key)
+
+    def subscribe(self, key):
+        subscription = super().subscribe(key)
+        with self.lock:
+            if key not in self.seen:
+                self.seen[key] = cache.get(self.counter_key(key))
+            if self.poller is None:
+                self.poller = threading.Thread(target=self.poll, daemon=True)
+                self.poller.start()
+        return subscription
+
+    def poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                for key in set(self.seen) - set(self.topics):
+                    del self.seen[key]
+                keys = list(self.topics)
+            if not keys:
+                continue
+            try:
+                values = cache.get_many([self.counter_key(key) for key in keys])
+            except Exception:
+                continue
+            for key in keys:
+                value = values.get(self.counter_key(key))
+                with self.lock:
+                    changed = key in self.seen and self.seen[key] != value
+                    if changed:
+                        self.seen[key] = value
+                if changed:
+                    super().publish(key)
+
+
+availability_hub = InMemoryBroker()
+
+_notification_broker = None
+
+
+def get_notification_broker():
+    global _notification_broker
+    if _notification_broker is None:
+        path = getattr(settings, 'NOTIFICATION_BROKER', 'events.live.InMemoryBroker')
+        _notification_broker = import_string(path)()
+    return _notification_broker
+
+
+@receiver(setting_changed)
+def reset_notification_broker(setting, **kwargs):
+    global _notification_broker
+    if setting == 'NOTIFICATION_BROKER':
+        _notification_broker = None
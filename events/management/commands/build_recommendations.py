@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.recommendations import TOP_K, build_neighbors
+
+
+class Command(BaseCommand):
+    help = "Recompute each event's most similar upcoming events from co-attendance."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K, help="Neighbours kept per event.")
+        parser.add_argument('--ratings', action='store_true', help="Weight attendances by comment ratings.")
+        parser.add_argument('--database', default=None)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = build_neighbors(options['top_k'], options['ratings'], options['database'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} event neighbour(s) in {elapsed:.2f}s."))
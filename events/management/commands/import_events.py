@@ -0,0 +1,89 @@
+import os
+import time
+import traceback
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from django.utils import timezone
+
+from events.imports import IMPORT_BATCH_SIZE, IMPORT_FORMATS, EventImporter, file_digest, guess_format
+from events.models import CustomUser, Job
+
+
+class Command(BaseCommand):
+    help = (
+        "Import events from a CSV or JSON-lines file. Progress is checkpointed per batch, "
+        "so running the command again on the same file resumes after the last stored batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--organizer', help="Username used for rows without an 'organizer' column.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--restart', action='store_true', help="Ignore earlier runs over this file.")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = os.path.abspath(options['path'])
+        if not os.path.isfile(path):
+            raise CommandError(f"No such file: {path}")
+        digest = file_digest(path)
+
+        job = None
+        if not options['restart']:
+            job = Job.objects.filter(kind='event_import', payload__sha256=digest).order_by('-pk').first()
+        if job and job.status == 'done':
+            self.stdout.write(f"{path} was already imported by job {job.pk}; use --restart to import it again.")
+            return
+        if job:
+            self.stdout.write(f"Resuming job {job.pk} after row {job.progress}.")
+            # Claimed straight away so a worker does not run it concurrently.
+            Job.objects.filter(pk=job.pk).update(
+                status='running', started_at=timezone.now(), attempts=F('attempts') + 1
+            )
+        else:
+            # Created already claimed: a pending row could be picked up by a
+            # worker before this process marked it running.
+            job = Job.objects.create(
+                kind='event_import',
+                status='running',
+                started_at=timezone.now(),
+                attempts=1,
+                created_by=CustomUser.objects.filter(username=options['organizer']).first(),
+                payload={
+                    'path': path,
+                    'sha256': digest,
+                    'format': options['format'] or guess_format(path),
+                    'organizer': options['organizer'],
+                    'batch_size': options['batch_size'],
+                }
+            )
+
+        started = time.perf_counter()
+        resumed_from = job.progress
+        importer = EventImporter(job, on_error=self.report_error, on_batch=self.report_batch(started, resumed_from))
+        try:
+            importer.run()
+        except Exception:
+            Job.objects.filter(pk=job.pk).update(status='failed', error=traceback.format_exc())
+            raise
+        Job.objects.filter(pk=job.pk).update(status='done', error='', finished_at=timezone.now())
+
+        elapsed = time.perf_counter() - started
+        rows = job.progress - resumed_from
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {importer.created} event(s), rejected {importer.rejected} row(s). "
+            f"{rows} row(s) in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)."
+        ))
+
+    def report_error(self, row_number, messages):
+        self.stderr.write(f"Row {row_number}: {' '.join(messages)}")
+
+    def report_batch(self, started, resumed_from):
+        def report(job):
+            if self.verbosity >= 2:
+                elapsed = time.perf_counter() - started
+                rate = (job.progress - resumed_from) / elapsed if elapsed else 0
+                self.stdout.write(f"{job.progress} row(s) processed ({rate:.0f} rows/s)")
+        return report
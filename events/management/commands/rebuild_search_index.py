@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for events."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'])
+        started = time.perf_counter()
+        count = backend.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} event(s) with {type(backend).__name__} in {elapsed:.2f}s."
+        ))
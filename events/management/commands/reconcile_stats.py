@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from events.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = "Rebuild the platform statistics rollup from source rows and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing.")
+
+    def handle(self, *args, **options):
+        drift = reconcile(dry_run=options['dry_run'])
+        for key, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(f"{key}: stored={stored}, actual={actual}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"{len(drift)} counter(s) would be fixed."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(drift)} counter(s) fixed; daily aggregates rebuilt."))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from events.models import Event, Ticket
+
+
+class Command(BaseCommand):
+    help = "Recompute Event.tickets_sold from active tickets and fix any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        active_count = Subquery(
+            Ticket.objects.filter(event=OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('event')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        drifted = (
+            Event.objects.annotate(actual=Coalesce(active_count, 0))
+            .exclude(tickets_sold=F('actual'))
+            .order_by('pk')
+            .values_list('pk', 'tickets_sold', 'actual')
+        )
+
+        fixed = 0
+        last_pk = 0
+        while True:
+            batch = list(drifted.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            for pk, stored, actual in batch:
+                self.stdout.write(f"Event {pk}: tickets_sold={stored}, active tickets={actual}")
+            if not options['dry_run']:
+                # Recompute inside the UPDATE so purchases made since the scan are not lost.
+                Event.objects.filter(pk__in=[pk for pk, _, _ in batch]).update(
+                    tickets_sold=Coalesce(active_count, 0), changed_at=timezone.now()
+                )
+            fixed += len(batch)
+
+        verb = "would be fixed" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{fixed} event(s) {verb}."))
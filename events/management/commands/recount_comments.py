@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = "Rebuild each event's comment and rating counters from its comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None)
+
+    def handle(self, *args, **options):
+        count = Event.objects.using(options['database']).recount_comments()
+        self.stdout.write(self.style.SUCCESS(f"Fixed comment counters on {count} event(s)."))
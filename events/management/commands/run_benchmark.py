@@ -0,0 +1,101 @@
+import asyncio
+import json
+import platform
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from events.benchmark import find_targets, run_asgi, run_sync
+from events.models import CustomUser, Event, Notification, Ticket
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every route in events/urls.py in-process against the current database "
+        "(seed it with seed_benchmark) and report latency percentiles and queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help="Measured requests per route and identity.")
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--mode', choices=['sync', 'asgi'], default='sync')
+        parser.add_argument('--concurrency', type=int, default=10, help="In-flight requests per route (asgi mode).")
+        parser.add_argument('--routes', nargs='*', help="Only these URL names.")
+        parser.add_argument('--prefix', default='bench', help="Prefix the data set was seeded with.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--baseline', help="An earlier --output file to compare these results against.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['routes']
+        try:
+            users, targets = find_targets(options['prefix'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No '{options['prefix']}' data set; run seed_benchmark first.")
+        if options['routes']:
+            targets = [(name, url) for name, url in targets if name in options['routes']]
+
+        started = time.perf_counter()
+        # The test clients send Host: testserver.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            if options['mode'] == 'asgi':
+                routes = asyncio.run(run_asgi(
+                    users, targets, options['requests'], options['concurrency'], options['warmup']
+                ))
+            else:
+                routes = run_sync(users, targets, options['requests'], options['warmup'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{'route':<45} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}  statuses")
+        for label, result in routes.items():
+            self.stdout.write(
+                f"{label:<45} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} "
+                f"{result['queries_per_request'] if result['queries_per_request'] is not None else '-':>8}  "
+                f"{result['statuses']}"
+            )
+        if baseline:
+            self.compare(baseline, routes)
+
+        if options['output']:
+            report = {
+                'created_at': timezone.now().isoformat(),
+                'mode': options['mode'],
+                'concurrency': options['concurrency'] if options['mode'] == 'asgi' else 1,
+                'requests_per_route': options['requests'],
+                'elapsed_s': round(elapsed, 2),
+                'environment': {
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                },
+                'data_set': {
+                    'users': CustomUser.objects.count(),
+                    'events': Event.objects.count(),
+                    'tickets': Ticket.objects.count(),
+                    'notifications': Notification.objects.count(),
+                },
+                'routes': routes,
+            }
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+        self.stdout.write(self.style.SUCCESS(f"Benchmarked {len(routes)} route(s) in {elapsed:.1f}s."))
+
+    def compare(self, baseline, routes):
+        self.stdout.write(f"\n{'against baseline (ms)':<45} {'p50':>22} {'p95':>22} {'p99':>22}")
+        for label, result in routes.items():
+            if label not in baseline:
+                continue
+            columns = []
+            for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+                before, after = baseline[label][key], result[key]
+                change = (after - before) / before * 100 if before else 0
+                columns.append(f"{before} → {after} ({change:+.0f}%)")
+            self.stdout.write(f"{label:<45} " + ' '.join(f"{column:>22}" for column in columns))
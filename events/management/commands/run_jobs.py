@@ -0,0 +1,47 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from events.jobs import claim_next_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs (notification fan-out and similar)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true', help="Exit once the queue is empty.")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--max-jobs', type=int, default=None)
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help="Requeue jobs left running by a crashed worker after this many seconds."
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs(timedelta(seconds=options['stale_after']))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+        processed = 0
+        try:
+            while options['max_jobs'] is None or processed < options['max_jobs']:
+                job = claim_next_job()
+                if job is None:
+                    if options['burst']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                started = time.perf_counter()
+                ok = run_job(job)
+                job.refresh_from_db()
+                self.stdout.write(
+                    f"Job {job.pk} {job.kind}: {job.status} "
+                    f"({job.progress}/{job.total or 0}) in {time.perf_counter() - started:.2f}s"
+                )
+                if not ok:
+                    self.stderr.write(job.error.strip().splitlines()[-1])
+                processed += 1
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)."))
@@ -0,0 +1,171 @@
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from events.models import CustomUser, Event, EventCategory, EventComment, Notification, Ticket
+from events.recommendations import build_neighbors
+from events.search import get_search_backend
+from events.stats import reconcile
+from events.ticket_numbers import get_ticket_number_generator
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic data set with bulk_create for load testing. Every generated "
+        "user is named '<prefix>-...' and shares one password; '<prefix>-admin' is a superuser."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="Attendees.")
+        parser.add_argument('--organizers', type=int, default=50)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--events', type=int, default=2000)
+        parser.add_argument('--tickets', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--notifications', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--password', default='benchmark')
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for repeatable data sets.")
+        parser.add_argument('--flush', action='store_true', help="Delete an earlier data set with this prefix first.")
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        prefix = options['prefix']
+
+        existing = CustomUser.objects.filter(username__startswith=f'{prefix}-')
+        if existing.exists():
+            if not options['flush']:
+                raise CommandError(f"Users named '{prefix}-*' already exist; pass --flush to replace them.")
+            self.timed("Flushed previous data set", lambda: (
+                existing.delete(), EventCategory.objects.filter(name__startswith=f'{prefix} ').delete()
+            ))
+
+        now = timezone.now()
+        password = make_password(options['password'])
+        attendee_ids = self.create(CustomUser, 'users', (
+            CustomUser(username=f'{prefix}-user-{i}', email=f'{prefix}-user-{i}@example.com',
+                       password=password, user_type=1)
+            for i in range(options['users'])
+        ))
+        admin = CustomUser(username=f'{prefix}-admin', password=password, user_type=3,
+                           is_staff=True, is_superuser=True)
+        organizer_ids = self.create(CustomUser, 'organizers', [admin] + [
+            CustomUser(username=f'{prefix}-org-{i}', password=password, user_type=2)
+            for i in range(options['organizers'])
+        ])
+        category_ids = self.create(EventCategory, 'categories', (
+            EventCategory(name=f'{prefix} category {i}') for i in range(options['categories'])
+        ))
+        if not attendee_ids and (options['tickets'] or options['comments'] or options['notifications']):
+            raise CommandError("Tickets, comments and notifications need --users > 0.")
+
+        # Tickets are allotted up front so every event is created with its
+        # final tickets_sold and never oversold.
+        events = []
+        for i in range(options['events']):
+            start = now + timedelta(days=self.random.randint(-60, 180), hours=self.random.randint(0, 23))
+            events.append(Event(
+                title=f'{prefix.title()} event {i}',
+                description=f"Synthetic event {i} for load testing. " * 3,
+                location=f'Venue {self.random.randint(1, 200)}',
+                start_date=start,
+                end_date=start + timedelta(hours=self.random.randint(1, 8)),
+                # The first event belongs to the admin so owner-only pages have a target.
+                organizer_id=organizer_ids[0] if i == 0 else self.random.choice(organizer_ids),
+                category_id=self.random.choice(category_ids) if category_ids else None,
+                event_type='private' if self.random.random() < 0.2 else 'public',
+                capacity=self.random.randint(50, 1000),
+                price=self.random.choice([0, 5, 10, 25, 50]),
+                is_active=i == 0 or self.random.random() < 0.95,
+            ))
+        if events and options['tickets']:
+            allotment = self.allot_tickets(events, options['tickets'])
+        else:
+            allotment = []
+        event_ids = self.create(Event, 'events', events)
+
+        generator = get_ticket_number_generator()
+        self.create(Ticket, 'tickets', (
+            Ticket(
+                event_id=event_ids[index], attendee_id=self.random.choice(attendee_ids),
+                price=events[index].price, ticket_number=number
+            )
+            for batch in batched(allotment, self.batch_size)
+            for index, number in zip(batch, generator.generate(len(batch)))
+        ))
+        self.create(EventComment, 'comments', (
+            EventComment(
+                event_id=self.random.choice(event_ids),
+                user_id=self.random.choice(attendee_ids),
+                content="Synthetic comment.",
+                rating=self.random.choice([None, 1, 2, 3, 4, 5]),
+            )
+            for _ in range(options['comments'] if event_ids else 0)
+        ))
+        types = [value for value, _ in Notification.NOTIFICATION_TYPES]
+        self.create(Notification, 'notifications', (
+            Notification(
+                user_id=self.random.choice(attendee_ids),
+                notification_type=self.random.choice(types),
+                message="Synthetic notification.",
+                is_read=self.random.random() < 0.5,
+                related_event_id=self.random.choice(event_ids) if event_ids else None,
+            )
+            for _ in range(options['notifications'])
+        ))
+
+        # bulk_create() skips the signals that maintain these.
+        self.timed("Rebuilt search index", get_search_backend().rebuild)
+        self.timed("Recounted comments", Event.objects.recount_comments)
+        self.timed("Reconciled platform stats", reconcile)
+        self.timed("Built recommendations", build_neighbors)
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded data set '{prefix}'. Log in as {prefix}-admin / {options['password']}."
+        ))
+
+    def allot_tickets(self, events, count):
+        open_events = [index for index, event in enumerate(events) if event.is_active]
+        allotment = []
+        while open_events and len(allotment) < count:
+            position = self.random.randrange(len(open_events))
+            event = events[open_events[position]]
+            allotment.append(open_events[position])
+            event.tickets_sold += 1
+            if event.tickets_sold >= event.capacity:
+                open_events[position] = open_events[-1]
+                open_events.pop()
+        if len(allotment) < count:
+            self.stderr.write(f"Only {len(allotment)} tickets fit in the generated events' capacity.")
+        return allotment
+
+    def create(self, model, label, objects):
+        ids = []
+        started = time.perf_counter()
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                ids.extend(obj.pk for obj in model.objects.bulk_create(batch))
+        elapsed = time.perf_counter() - started
+        rate = len(ids) / elapsed if elapsed else 0
+        self.stdout.write(f"Created {len(ids)} {label} in {elapsed:.2f}s ({rate:.0f} rows/s)")
+        return ids
+
+    def timed(self, label, func):
+        started = time.perf_counter()
+        func()
+        self.stdout.write(f"{label} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,103 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from events.models import CustomUser, Event, Ticket
+
+
+class Command(BaseCommand):
+    help = "Race concurrent ticket purchases against one event and verify capacity is never exceeded."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--capacity', type=int, default=500)
+        parser.add_argument('--quantity', type=int, default=1, help="Tickets per purchase.")
+        parser.add_argument('--keep', action='store_true', help="Keep the generated event and users.")
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        quantity = options['quantity']
+        run_id = uuid.uuid4().hex[:8]
+
+        organizer = CustomUser.objects.create_user(username=f'stress-org-{run_id}', user_type=2)
+        buyers = [
+            CustomUser.objects.create_user(username=f'stress-{run_id}-{i}', user_type=1)
+            for i in range(threads)
+        ]
+        event = Event.objects.create(
+            title=f'Stress test {run_id}',
+            description='Generated by stress_purchase.',
+            location='Nowhere',
+            start_date=timezone.now() + timedelta(days=30),
+            end_date=timezone.now() + timedelta(days=31),
+            organizer=organizer,
+            capacity=options['capacity'],
+            price=0
+        )
+
+        stats = {'purchases': 0, 'rejected': 0, 'retries': 0, 'errors': []}
+        lock = threading.Lock()
+        start = threading.Barrier(threads)
+
+        def buy(buyer):
+            try:
+                start.wait()
+                while True:
+                    try:
+                        Ticket.objects.purchase(event, buyer, quantity)
+                    except ValidationError:
+                        with lock:
+                            stats['rejected'] += 1
+                        return
+                    except OperationalError:
+                        # SQLite reports write contention as "database is locked".
+                        with lock:
+                            stats['retries'] += 1
+                        time.sleep(0.001)
+                        continue
+                    with lock:
+                        stats['purchases'] += 1
+            except Exception as e:
+                with lock:
+                    stats['errors'].append(repr(e))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=buy, args=(buyer,)) for buyer in buyers]
+        began = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - began
+
+        event.refresh_from_db()
+        issued = Ticket.objects.filter(event=event, is_active=True).count()
+        rate = stats['purchases'] / elapsed if elapsed else 0.0
+
+        self.stdout.write(f"threads={threads} capacity={event.capacity} quantity={quantity}")
+        self.stdout.write(
+            f"purchases={stats['purchases']} rejected={stats['rejected']} "
+            f"retries={stats['retries']} elapsed={elapsed:.3f}s"
+        )
+        self.stdout.write(f"purchases/second={rate:.1f}")
+        self.stdout.write(f"tickets_sold={event.tickets_sold} issued={issued}")
+
+        if not options['keep']:
+            event.delete()
+            organizer.delete()
+            CustomUser.objects.filter(pk__in=[b.pk for b in buyers]).delete()
+
+        if stats['errors']:
+            raise CommandError(f"Worker errors: {stats['errors'][:3]}")
+        if issued > event.capacity or issued != event.tickets_sold:
+            raise CommandError(
+                f"Capacity violated: capacity={event.capacity} tickets_sold={event.tickets_sold} issued={issued}"
+            )
+        self.stdout.write(self.style.SUCCESS("Capacity held."))
@@ -0,0 +1,125 @@
+import asyncio
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Uploads can be replaced under the same name, so browsers revalidate them.
+MUTABLE_CACHE_CONTROL = 'public, max-age=3600'
+
+
+def parse_range(header, size):
+    # (start, end) for a single satisfiable byte range, False for an
+    # unsatisfiable one, None for anything else (served in full).
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        return (max(size - length, 0), size - 1) if length and size else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def aread_range(path, start, length):
+    # Under ASGI a sync iterator is read into memory whole before the first
+    # byte is sent, so reads happen in a thread, a chunk at a time.
+    f = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(f.seek, start)
+        while length > 0:
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def file_response(request, path, name, immutable=False):
+    # Serves the file at ``path``, known to the proxy as ``name`` under
+    # MEDIA_ROOT. Immutable files are content-addressed: their name is
+    # their ETag and they are cached for a year.
+    try:
+        info = os.stat(path)
+    except OSError:
+        raise Http404("No such file.")
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404("No such file.")
+
+    if immutable:
+        etag = f'"{os.path.splitext(os.path.basename(name))[0]}"'
+    else:
+        etag = f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+    last_modified = int(info.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        response = body_response(request, path, name, info.st_size, etag, content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else MUTABLE_CACHE_CONTROL
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def body_response(request, path, name, size, etag, content_type):
+    offload = getattr(settings, 'MEDIA_OFFLOAD', None)
+    if offload == 'x-accel-redirect':
+        # nginx sends the file from an internal location, Range included.
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+        return response
+    if offload == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+
+    byte_range = None
+    if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+        byte_range = parse_range(request.headers['Range'], size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    asgi = isinstance(request, ASGIRequest)
+    if byte_range is None:
+        if not asgi:
+            return FileResponse(open(path, 'rb'), content_type=content_type)
+        response = StreamingHttpResponse(aread_range(path, 0, size), content_type=content_type)
+        response['Content-Length'] = str(size)
+        return response
+    start, end = byte_range
+    read = aread_range if asgi else read_range
+    response = StreamingHttpResponse(read(path, start, end - start + 1), status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    return response
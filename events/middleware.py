@@ -0,0 +1,119 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    # Called around each query by record_query(). The SQL still has its %s
+    # placeholders, so identical strings are the same query shape; a shape
+    # that repeats within one request is usually an N+1 in a loop.
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[sql] += 1
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.shapes.most_common() if count > 1}
+
+
+# The recorder for the current request. A context variable rather than a
+# per-request execute_wrapper(): database connections are per thread, and
+# under ASGI the ORM runs in sync_to_async threads, which do inherit the
+# request's context.
+_current_recorder = ContextVar('query_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def install_query_recorder_on_connect(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+class QueryInstrumentationMiddleware:
+    # Records every query a request runs, on all database aliases, and reports
+    # it as a Server-Timing header and an 'events.middleware' log line. The
+    # recorder is left on response.query_stats for tests. Queries run while a
+    # streaming response is being consumed are not included.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = self.start()
+        token = _current_recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self.report(request, response, recorder)
+
+    async def __acall__(self, request):
+        recorder = self.start()
+        token = _current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self.report(request, response, recorder)
+
+    def start(self):
+        # Connections opened before this module was imported missed the signal.
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        return QueryRecorder()
+
+    def report(self, request, response, recorder):
+        elapsed = time.perf_counter() - recorder.started
+        response.query_stats = recorder
+        duplicates = recorder.duplicates()
+        if getattr(settings, 'QUERY_TIMING_HEADER', settings.DEBUG):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+                f'dup;desc="{len(duplicates)} repeated shapes"',
+                f'total;dur={elapsed * 1000:.1f}',
+            ])
+
+        threshold = getattr(settings, 'QUERY_DUPLICATE_WARNING_THRESHOLD', 5)
+        worst = max(duplicates.values(), default=0)
+        logger.log(
+            logging.WARNING if worst >= threshold else logging.DEBUG,
+            "%s %s: %d queries in %.1fms, %d repeated shapes (worst x%d)",
+            request.method, request.path, recorder.count, recorder.duration * 1000, len(duplicates), worst
+        )
+        return response
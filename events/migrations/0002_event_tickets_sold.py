@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_tickets_sold(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Ticket = apps.get_model('events', 'Ticket')
+    active = (
+        Ticket.objects.filter(event=OuterRef('pk'), is_active=True)
+        .order_by().values('event').annotate(count=Count('pk')).values('count')
+    )
+    Event.objects.using(schema_editor.connection.alias).update(tickets_sold=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='tickets_sold',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_tickets_sold, migrations.RunPython.noop),
+    ]
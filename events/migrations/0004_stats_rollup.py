@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('key', models.CharField(max_length=50)),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+            options={
+                'unique_together': {('day', 'key', 'shard')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PlatformCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50)),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+            options={
+                'unique_together': {('key', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_picture_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_image_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='changed_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
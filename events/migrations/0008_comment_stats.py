@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    EventComment = apps.get_model('events', 'EventComment')
+    comments = EventComment.objects.filter(event=OuterRef('pk')).order_by().values('event')
+    Event.objects.using(schema_editor.connection.alias).update(**{
+        field: Coalesce(Subquery(comments.annotate(value=aggregate).values('value')), 0)
+        for field, aggregate in (
+            ('comment_count', Count('pk')), ('rating_count', Count('rating')), ('rating_sum', Sum('rating'))
+        )
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_event_changed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='eventcomment',
+            index=models.Index(fields=['event', '-created_at', '-id'], name='comment_event_created_idx'),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
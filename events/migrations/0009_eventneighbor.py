@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_comment_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='events.event')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='events.event')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('event', 'neighbor'), name='event_neighbor_unique')],
+            },
+        ),
+    ]
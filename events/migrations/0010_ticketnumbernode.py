@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_eventneighbor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketNumberNode',
+            fields=[
+                ('node_id', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('holder', models.CharField(max_length=255)),
+                ('renewed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_event_prices(apps, schema_editor):
+    # The price paid for existing tickets is unknown; today's event price is
+    # the best guess, and what revenue was computed from until now.
+    Event = apps.get_model('events', 'Event')
+    Ticket = apps.get_model('events', 'Ticket')
+    price = Event.objects.filter(pk=OuterRef('event_id')).values('price')
+    Ticket.objects.using(schema_editor.connection.alias).update(price=Subquery(price))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_ticketnumbernode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_event_prices, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,18 @@
-from django.db import models
+import random
+from functools import partial
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
+from .live import availability_hub
+from .ticket_numbers import get_ticket_number_generator
+
 
 class CustomUser(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -16,6 +24,8 @@ class CustomUser(AbstractUser):
     user_type = models.PositiveSmallIntegerField(choices=USER_TYPE_CHOICES, default=1)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # SHA-256 of profile_picture; names its derivatives (see events.images).
+    profile_picture_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
     bio = models.TextField(blank=True, null=True)
     groups = models.ManyToManyField(
         Group,
@@ -34,6 +44,12 @@ class CustomUser(AbstractUser):
         related_query_name="user",
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_user_type = instance.__dict__.get('user_type')
+        return instance
+
     def __str__(self):
         return self.username
 
@@ -45,6 +61,67 @@ class EventCategory(models.Model):
         return self.name
 
 
+def _count_subquery(queryset, field):
+    # A correlated COUNT() keeps every annotation one row per event, unlike
+    # joining several reverse relations and multiplying their row counts.
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(field).annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+class EventQuerySet(models.QuerySet):
+    def attended_by(self, user):
+        # IN (...) rather than EXISTS lets the planner start from the user's
+        # tickets instead of probing them once per event.
+        held = Ticket.objects.filter(attendee=user, is_active=True)
+        return self.filter(pk__in=held.values('event')).annotate(
+            tickets_held=_count_subquery(held.filter(event=OuterRef('pk')), 'event')
+        )
+
+    def with_stats(self):
+        return self.annotate(
+            revenue=ExpressionWrapper(
+                F('tickets_sold') * F('price'),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            ),
+            comments_total=F('comment_count'),
+        )
+
+    def recount_comments(self):
+        # Rebuilds the comment counters from the comments themselves. Only
+        # events whose counters drifted are written, since changed_at
+        # invalidates their cached pages and cards. Returns how many.
+        comments = EventComment.objects.filter(event=OuterRef('pk')).order_by().values('event')
+        actual = {
+            field: Coalesce(Subquery(comments.annotate(value=aggregate).values('value')), 0)
+            for field, aggregate in (
+                ('comment_count', Count('pk')), ('rating_count', Count('rating')), ('rating_sum', Sum('rating'))
+            )
+        }
+        drifted = Q()
+        for field in actual:
+            drifted |= ~Q(**{field: F(f'actual_{field}')})
+        stale = self.annotate(**{f'actual_{field}': value for field, value in actual.items()}).filter(drifted)
+        # Recomputed inside the UPDATE, so comments added since the scan count.
+        return self.model.objects.using(self.db).filter(pk__in=stale.values('pk')).update(
+            changed_at=timezone.now(), **actual
+        )
+
+    def recommended_for(self, user):
+        # Upcoming events similar to those the user holds tickets for, best
+        # first: each candidate scores the sum of its similarities to them.
+        held = Ticket.objects.filter(attendee=user, is_active=True).values('event')
+        return self.filter(
+            is_active=True, start_date__gt=timezone.now(), neighbor_of__event__in=held
+        ).exclude(pk__in=held).annotate(
+            score=Sum('neighbor_of__score')
+        ).order_by('-score', 'start_date', 'pk')
+
+
 class Event(models.Model):
     EVENT_TYPE_CHOICES = (
         ('public', 'Public'),
@@ -64,7 +141,65 @@ class Event(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Unlike updated_at, also moved by ticket sales and comments: anything
+    # that changes how the event's pages render. See adjust_tickets_sold()
+    # and adjust_comment_stats().
+    changed_at = models.DateTimeField(auto_now=True)
     image = models.ImageField(upload_to='event_images/', blank=True, null=True)
+    image_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+    tickets_sold = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Comments may leave the rating out, so only rated ones are counted here.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = EventQuerySet.as_manager()
+
+    # Denormalized counters are only ever written with F() updates, so a plain
+    # save() of a stale instance must not overwrite them.
+    COUNTER_FIELDS = ('tickets_sold', 'comment_count', 'rating_count', 'rating_sum')
+    # Changes to these are announced to ticket holders.
+    MATERIAL_FIELDS = ('start_date', 'end_date', 'location', 'price')
+
+    class Meta:
+        indexes = [
+            # Listings only ever show active events, so the partial index
+            # skips cancelled ones (backends without partial indexes skip it).
+            models.Index(fields=['start_date', 'event_type'], condition=Q(is_active=True), name='event_active_start_idx'),
+            models.Index(fields=['-created_at'], name='event_created_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = (instance.__dict__.get('is_active'), instance.__dict__.get('start_date'))
+        return instance
+
+    @classmethod
+    def adjust_tickets_sold(cls, event_id, delta, revenue):
+        if not delta:
+            return
+        cls.objects.filter(pk=event_id).update(tickets_sold=F('tickets_sold') + delta, changed_at=timezone.now())
+        publish_availability(event_id)
+        record_ticket_sales(delta, revenue)
+
+    @classmethod
+    def adjust_comment_stats(cls, event_id, comments=0, ratings=0, rating_sum=0, using=None):
+        # Moves changed_at even when no counter moves, for edited comments.
+        cls.objects.using(using).filter(pk=event_id).update(
+            comment_count=F('comment_count') + comments,
+            rating_count=F('rating_count') + ratings,
+            rating_sum=F('rating_sum') + rating_sum,
+            changed_at=timezone.now(),
+        )
     
     def clean(self):
         if self.end_date <= self.start_date:
@@ -81,8 +216,70 @@ class Event(models.Model):
     
     @property
     def available_tickets(self):
-        sold_tickets = self.tickets.filter(is_active=True).count()
-        return self.capacity - sold_tickets
+        return max(self.capacity - self.tickets_sold, 0)
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+
+class TicketQuerySet(models.QuerySet):
+    # Fresh ticket numbers are drawn this many times before giving up.
+    ISSUE_ATTEMPTS = 3
+
+    def purchase(self, event, attendee, quantity):
+        with transaction.atomic(using=self.db):
+            # The conditional UPDATE both checks and reserves capacity, so
+            # concurrent buyers can never push tickets_sold past capacity.
+            reserved = Event.objects.filter(
+                pk=event.pk,
+                is_active=True,
+                tickets_sold__lte=F('capacity') - quantity
+            ).update(tickets_sold=F('tickets_sold') + quantity, changed_at=timezone.now())
+            if not reserved:
+                current = Event.objects.filter(pk=event.pk).values('is_active', 'capacity', 'tickets_sold').first()
+                if not current or not current['is_active']:
+                    raise ValidationError("This event is no longer available.")
+                available = max(current['capacity'] - current['tickets_sold'], 0)
+                raise ValidationError(f"Only {available} tickets available.")
+            record_ticket_sales(quantity, quantity * event.price)
+            publish_availability(event.pk, using=self.db)
+            for attempt in range(self.ISSUE_ATTEMPTS):
+                try:
+                    # A savepoint, so a clash with a misconfigured node's
+                    # numbers only redoes the INSERT, not the reservation.
+                    with transaction.atomic(using=self.db):
+                        return self.bulk_create([
+                            self.model(
+                                event=event,
+                                attendee=attendee,
+                                is_active=True,
+                                price=event.price,
+                                ticket_number=ticket_number
+                            )
+                            for ticket_number in get_ticket_number_generator().generate(quantity)
+                        ])
+                except IntegrityError:
+                    if attempt == self.ISSUE_ATTEMPTS - 1:
+                        raise
+
+    def deactivate(self):
+        with transaction.atomic(using=self.db):
+            rows = list(
+                self.filter(is_active=True)
+                .select_for_update()
+                .values_list('pk', 'event_id', 'price')
+            )
+            if not rows:
+                return 0
+            per_event = {}
+            for _, event_id, price in rows:
+                count, revenue = per_event.get(event_id, (0, 0))
+                per_event[event_id] = (count + 1, revenue + price)
+            self.model.objects.filter(pk__in=[row[0] for row in rows]).update(is_active=False)
+            for event_id, (count, revenue) in per_event.items():
+                Event.adjust_tickets_sold(event_id, -count, -revenue)
+        return len(rows)
 
 
 class Ticket(models.Model):
@@ -90,14 +287,27 @@ class Ticket(models.Model):
     attendee = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='tickets')
     purchase_date = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
+    # What the attendee paid: the event's price when the ticket was issued.
+    # Revenue is summed from this, so later price edits leave it alone.
+    price = models.DecimalField(max_digits=10, decimal_places=2)
     ticket_number = models.CharField(max_length=20, unique=True)
+
+    objects = TicketQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event'], condition=Q(is_active=True), name='ticket_active_event_idx'),
+            models.Index(fields=['attendee', 'event'], condition=Q(is_active=True), name='ticket_active_attendee_idx'),
+        ]
     
     def __str__(self):
         return f"Ticket #{self.ticket_number} for {self.event.title}"
     
     def save(self, *args, **kwargs):
         if not self.ticket_number:
-            self.ticket_number = f"TICK-{self.event.id}-{self.attendee.id}-{timezone.now().timestamp()}"
+            self.ticket_number = get_ticket_number_generator().generate()[0]
+        if self.price is None:
+            self.price = self.event.price
         super().save(*args, **kwargs)
 
 
@@ -113,11 +323,41 @@ class EventComment(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Comment pages are keyset pages, newest first.
+            models.Index(fields=['event', '-created_at', '-id'], name='comment_event_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = (instance.__dict__.get('event_id'), instance.__dict__.get('rating'))
+        return instance
     
     def __str__(self):
         return f"Comment by {self.user.username} on {self.event.title}"
 
 
+class EventNeighbor(models.Model):
+    # The events most often attended (and liked) by the same people as
+    # ``event``, rebuilt in bulk by the build_recommendations command.
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='neighbor_of')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # Also the index recommendations are read through: from the
+            # events a user holds to their neighbours.
+            models.UniqueConstraint(fields=['event', 'neighbor'], name='event_neighbor_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} -> {self.neighbor_id} ({self.score:.3f})"
+
+
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = (
@@ -133,7 +373,124 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     related_event = models.ForeignKey(Event, on_delete=models.CASCADE, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_unread_idx'),
+        ]
     
     def __str__(self):
         return f"{self.notification_type} for {self.user.username}"
-    
\ No newline at end of file
+
+
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    checkpoint = models.JSONField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def label(self):
+        return self.kind.replace('_', ' ')
+
+    @property
+    def percent_complete(self):
+        if not self.total:
+            return 100 if self.status == 'done' else 0
+        return min(100, self.progress * 100 // self.total)
+
+
+class PlatformCounter(models.Model):
+    # Running platform totals. Each counter is spread over SHARDS rows that
+    # are bumped at random, so concurrent writers rarely wait on each other;
+    # readers sum the shards.
+    SHARDS = 8
+
+    key = models.CharField(max_length=50)
+    shard = models.PositiveSmallIntegerField(default=0)
+    value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('key', 'shard')
+
+    def __str__(self):
+        return f"{self.key}[{self.shard}] = {self.value}"
+
+    @classmethod
+    def bump(cls, **deltas):
+        for key, delta in deltas.items():
+            if delta:
+                _increment(cls, {'key': key, 'shard': random.randrange(cls.SHARDS)}, delta)
+
+
+class DailyStat(models.Model):
+    SHARDS = 4
+
+    day = models.DateField()
+    key = models.CharField(max_length=50)
+    shard = models.PositiveSmallIntegerField(default=0)
+    value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('day', 'key', 'shard')
+
+    def __str__(self):
+        return f"{self.day} {self.key}[{self.shard}] = {self.value}"
+
+    @classmethod
+    def bump(cls, day=None, **deltas):
+        day = day or timezone.localdate()
+        for key, delta in deltas.items():
+            if delta:
+                _increment(cls, {'day': day, 'key': key, 'shard': random.randrange(cls.SHARDS)}, delta)
+
+
+class TicketNumberNode(models.Model):
+    # Node id leases for SnowflakeGenerator: a process without a configured
+    # TICKET_NUMBER_NODE_ID claims a free id here and keeps renewing it.
+    node_id = models.PositiveSmallIntegerField(primary_key=True)
+    holder = models.CharField(max_length=255)
+    renewed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"node {self.node_id} ({self.holder})"
+
+def _increment(model, lookup, delta):
+    if model.objects.filter(**lookup).update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(value=delta, **lookup)
+    except IntegrityError:
+        # Another writer created the row first.
+        model.objects.filter(**lookup).update(value=F('value') + delta)
+
+
+def record_ticket_sales(quantity, revenue):
+    PlatformCounter.bump(tickets_sold=quantity, revenue=revenue)
+    if quantity > 0:
+        DailyStat.bump(tickets_sold=quantity, revenue=revenue)
+
+
+def publish_availability(event_id, using=None):
+    # Subscribers re-read the event, so only tell them once the change is
+    # committed and visible.
+    transaction.on_commit(partial(availability_hub.publish, event_id), using=using)
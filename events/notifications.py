@@ -0,0 +1,113 @@
+import uuid
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .live import get_notification_broker
+from .models import Notification
+
+# Unread counts are cached per user and adjusted in place when notifications
+# are created or read. A count is filed under the user's current version:
+# anything that can't cheaply work out the new value moves the version
+# instead of deleting the count, so a count read from the database before
+# that change lands under a version nobody reads any more.
+UNREAD_COUNT_TIMEOUT = 60 * 60 * 24
+
+
+def unread_version_key(user_id):
+    return f'events:unread-version:{user_id}'
+
+
+def unread_count_key(user_id, version):
+    return f'events:unread-notifications:{user_id}:{version}'
+
+
+def new_version():
+    # Never reused, so a version evicted from the cache can't bring back
+    # counts filed under it.
+    return uuid.uuid4().hex
+
+
+def get_unread_version(user_id):
+    key = unread_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_unread_version(user_id):
+    key = unread_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, new_version(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def get_unread_count(user):
+    key = unread_count_key(user.pk, get_unread_version(user.pk))
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user.pk, is_read=False).count()
+        # add(), so an adjustment made meanwhile is not overwritten.
+        cache.add(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+async def aget_unread_count(user):
+    key = unread_count_key(user.pk, await aget_unread_version(user.pk))
+    count = await cache.aget(key)
+    if count is None:
+        count = await Notification.objects.filter(user_id=user.pk, is_read=False).acount()
+        await cache.aadd(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def adjust_unread_count(user_id, delta, using=None):
+    # Applied once the change commits: a rolled back notification must not
+    # move the count.
+    transaction.on_commit(partial(_adjust_unread_count, user_id, delta), using=using)
+
+
+def _adjust_unread_count(user_id, delta):
+    version = cache.get(unread_version_key(user_id))
+    if version is None:
+        # Nothing counted yet; the next read starts a new version.
+        return
+    key = unread_count_key(user_id, version)
+    try:
+        if delta > 0:
+            count = cache.incr(key, delta)
+        else:
+            count = cache.decr(key, -delta)
+    except ValueError:
+        # Not cached, but a read may be counting from before this change.
+        _move_versions([user_id])
+        return
+    if count < 0:
+        _move_versions([user_id])
+
+
+def _move_versions(user_ids):
+    cache.set_many({unread_version_key(user_id): new_version() for user_id in set(user_ids)}, None)
+
+
+def invalidate_unread_counts(user_ids, using=None):
+    # Also on commit, or a read before then would cache the old count again.
+    transaction.on_commit(partial(_move_versions, list(user_ids)), using=using)
+
+
+def announce_notifications(user_ids):
+    # Wakes the users' open notification streams once the new rows are
+    # committed; the streams read them from the database.
+    user_ids = set(user_ids)
+
+    def publish():
+        broker = get_notification_broker()
+        for user_id in user_ids:
+            broker.publish(user_id)
+
+    transaction.on_commit(publish)
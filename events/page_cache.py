@@ -0,0 +1,87 @@
+import asyncio
+import math
+import random
+import time
+from functools import partial
+
+from django.core.cache import cache
+
+# Whole pages that are the same for every visitor, such as an anonymous
+# event detail page. Each entry is tagged with the version it was built
+# from (the event's changed_at), so a write is seen by the next request
+# without deleting anything. The timeout bounds how long what the version
+# does not cover (organizer and commenter profiles, "5 minutes ago") can
+# lag behind.
+PAGE_TIMEOUT = 60
+# Entries outlive their timeout so there is something to serve while
+# another process rebuilds them.
+STALE_TIMEOUT = 60 * 10
+# Longest a rebuild holds the lock; others serve the stale entry meanwhile.
+LOCK_TIMEOUT = 10
+# XFetch's beta: above 1 refreshes earlier, below 1 later.
+EARLY_REFRESH_BETA = 1.0
+
+
+def page_key(name):
+    return f'events:page:{name}'
+
+
+def lock_key(name, version):
+    return f'events:page-lock:{name}:{version}'
+
+
+def needs_refresh(entry, now):
+    # Probabilistic early refresh (XFetch): each request volunteers with a
+    # probability that grows as expiry nears, scaled by how long a rebuild
+    # takes, so one request rebuilds shortly before the entry expires
+    # instead of every request at once just after.
+    return now - entry['delta'] * EARLY_REFRESH_BETA * math.log(1 - random.random()) >= entry['expires']
+
+
+_rebuilding = {}
+
+
+async def cached_page(name, version, build):
+    # The page for ``version``. build() renders it and returns its content,
+    # or None when this render cannot be shared; None is then returned too.
+    entry = await cache.aget(page_key(name))
+    current = entry if entry and entry['version'] == version else None
+    if current and not needs_refresh(current, time.time()):
+        return current['content']
+
+    # Requests in this process share one rebuild; across processes the
+    # lock picks one, and the rest keep serving the entry they have.
+    key = (name, version)
+    task = _rebuilding.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = _rebuilding[key] = asyncio.ensure_future(_rebuild(name, version, build, entry))
+        task.add_done_callback(partial(_forget, key))
+    return await asyncio.shield(task)
+
+
+def _forget(key, task):
+    if _rebuilding.get(key) is task:
+        del _rebuilding[key]
+
+
+async def _rebuild(name, version, build, entry):
+    locked = await cache.aadd(lock_key(name, version), True, LOCK_TIMEOUT)
+    # Only an entry of this version can stand in: an older one would go out
+    # under the new version's validators, so it is rendered here instead.
+    if not locked and entry and entry['version'] == version:
+        return entry['content']
+    try:
+        started = time.time()
+        content = await build()
+        if content is not None:
+            finished = time.time()
+            await cache.aset(page_key(name), {
+                'version': version,
+                'content': content,
+                'delta': finished - started,
+                'expires': finished + PAGE_TIMEOUT,
+            }, STALE_TIMEOUT)
+        return content
+    finally:
+        if locked:
+            await cache.adelete(lock_key(name, version))
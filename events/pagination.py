@@ -0,0 +1,195 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import Http404
+from django.views.generic.base import ContextMixin
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    is_cursor_page = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+# Keyset pagination over a unique ordering such as ('start_date', 'pk'): each
+# page is one range query for per_page + 1 rows, nothing is counted, and the
+# cost does not grow with page depth.
+class CursorPaginator:
+    def __init__(self, queryset, per_page, ordering=('start_date', 'pk')):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.keys = [key.lstrip('-') for key in self.ordering]
+        self.descending = [key.startswith('-') for key in self.ordering]
+        self.fields = [self._resolve_field(key) for key in self.keys]
+
+    def _resolve_field(self, path):
+        model = self.queryset.model
+        field = None
+        for name in path.split('__'):
+            field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            if field.is_relation:
+                model = field.related_model
+        if field is None:
+            raise FieldDoesNotExist(path)
+        return field
+
+    def _values(self, obj):
+        values = []
+        for key in self.keys:
+            value = obj
+            for name in key.split('__'):
+                value = getattr(value, name)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, direction, obj):
+        values = [
+            value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+            for value in self._values(obj)
+        ]
+        payload = json.dumps([direction] + values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, *raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in ('n', 'p') or len(raw) != len(self.fields):
+                raise InvalidCursor(cursor)
+            values = [field.to_python(value) for field, value in zip(self.fields, raw)]
+        except (InvalidCursor, ValueError, TypeError, ValidationError, binascii.Error):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _after(self, values, backwards):
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), per key direction.
+        condition = Q()
+        for index, key in enumerate(self.keys):
+            descending = self.descending[index] != backwards
+            lookup = f'{key}__lt' if descending else f'{key}__gt'
+            term = Q(**{lookup: values[index]})
+            for previous in range(index):
+                term &= Q(**{self.keys[previous]: values[previous]})
+            condition |= term
+        return condition
+
+    def _query(self, cursor):
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+            backwards = direction == 'p'
+            queryset = queryset.filter(self._after(values, backwards))
+
+        ordering = self.ordering
+        if backwards:
+            ordering = [key[1:] if key.startswith('-') else f'-{key}' for key in ordering]
+        return queryset.order_by(*ordering)[:self.per_page + 1], backwards
+
+    def _page(self, rows, cursor, backwards):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = self.encode_cursor('n', rows[-1])
+            if (has_more and backwards) or (cursor and not backwards):
+                previous_cursor = self.encode_cursor('p', rows[0])
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+    def page(self, cursor=None):
+        queryset, backwards = self._query(cursor)
+        return self._page(list(queryset), cursor, backwards)
+
+    async def apage(self, cursor=None):
+        queryset, backwards = self._query(cursor)
+        return self._page([row async for row in queryset.aiterator()], cursor, backwards)
+
+
+# ListView mixin serving keyset pages (?cursor=...). Requests with ?page=N,
+# or where use_cursor_pagination() returns False, get the regular
+# page-number paginator instead.
+class CursorPaginationMixin:
+    cursor_ordering = ('start_date', 'pk')
+    cursor_kwarg = 'cursor'
+
+    def use_cursor_pagination(self):
+        return self.page_kwarg not in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    async def apaginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return await sync_to_async(self._paginate_by_number)(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = await paginator.apage(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def _paginate_by_number(self, queryset, page_size):
+        # Django's Paginator has no async API. The page is evaluated here too,
+        # so rendering it doesn't query from the event loop.
+        paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        page.object_list = list(object_list)
+        return (paginator, page, page.object_list, is_paginated)
+
+    async def aget_context_data(self, **kwargs):
+        # MultipleObjectMixin.get_context_data() for async views.
+        paginator, page, object_list, is_paginated = await self.apaginate_queryset(
+            self.object_list, self.get_paginate_by(self.object_list)
+        )
+        context = {
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': is_paginated,
+            'object_list': object_list,
+        }
+        context_object_name = self.get_context_object_name(object_list)
+        if context_object_name is not None:
+            context[context_object_name] = object_list
+        context.update(kwargs)
+        return ContextMixin.get_context_data(self, **context)
@@ -0,0 +1,116 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Avg
+from django.utils import timezone
+
+from .models import Event, EventComment, EventNeighbor, Ticket
+
+# Item-to-item recommendations. Each user is a sparse row of the events
+# they attended, each event a column; two events are similar when the same
+# people attended them (cosine similarity of their columns). Only the best
+# TOP_K neighbours of each event are kept, so serving a user is one indexed
+# read from the events they hold to their neighbours.
+TOP_K = 20
+# A rating moves an attendance's weight of 1 by this much per star away
+# from 3; a rating without a ticket counts on its own, if positive.
+RATING_WEIGHT = 0.25
+# Co-attendance pairs are generated this many at a time, which bounds the
+# memory a build needs whatever the number of tickets.
+PAIR_BATCH = 5_000_000
+STORE_BATCH = 1000
+
+
+def item_neighbors(user_ids, event_ids, weights, top_k=TOP_K, candidates=None):
+    # (events, neighbors, scores) arrays holding the top_k most similar
+    # events of every event, given the matrix as (user, event, weight)
+    # triples. ``candidates`` limits which events may be neighbours.
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    events, items = np.unique(np.asarray(event_ids, dtype=np.int64), return_inverse=True)
+    users = np.unique(user_ids, return_inverse=True)[1]
+    size = len(events)
+
+    # Repeated cells are summed; cells are sorted by user, then event.
+    cells, cell_index = np.unique(users * size + items, return_inverse=True)
+    values = np.bincount(cell_index, weights=np.asarray(weights, dtype=np.float64))
+    keep = values > 0
+    cells, values = cells[keep], values[keep]
+    rows, cols = cells // size, cells % size
+    norms = np.sqrt(np.bincount(cols, weights=values ** 2, minlength=size))
+    values = values / norms[cols]
+    allowed = np.ones(size, dtype=bool) if candidates is None else np.isin(events, candidates)
+
+    # Every ordered pair of events within a user's row, a batch of users at
+    # a time, reduced to one partial sum per pair before the next batch.
+    counts = np.bincount(rows)
+    starts = np.cumsum(counts) - counts
+    pair_ends = np.cumsum(counts.astype(np.int64) ** 2)
+    pairs, scores = np.empty(0, dtype=np.int64), np.empty(0)
+    first = 0
+    while first < len(counts):
+        base = pair_ends[first - 1] if first else 0
+        last = max(int(np.searchsorted(pair_ends, base + PAIR_BATCH, 'right')), first + 1)
+        lefts = np.arange(starts[first], starts[last - 1] + counts[last - 1])
+        repeats = counts[rows[lefts]]
+        left = np.repeat(lefts, repeats)
+        offsets = np.arange(len(left)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        right = np.repeat(starts[rows[lefts]], repeats) + offsets
+        mask = (left != right) & allowed[cols[right]]
+        left, right = left[mask], right[mask]
+        keys, index = np.unique(np.concatenate([pairs, cols[left] * size + cols[right]]), return_inverse=True)
+        scores = np.bincount(index, weights=np.concatenate([scores, values[left] * values[right]]))
+        pairs = keys
+        first = last
+
+    # Best first within each event, ties to the lower id; then the top_k.
+    sources, targets = pairs // size, pairs % size
+    order = np.lexsort((targets, -scores, sources))
+    sources, targets, scores = sources[order], targets[order], scores[order]
+    rank = np.arange(len(sources)) - np.searchsorted(sources, sources)
+    keep = rank < top_k
+    return events[sources[keep]], events[targets[keep]], scores[keep]
+
+
+def load_interactions(include_ratings=False, using=None):
+    # The matrix as (user, event, weight) arrays: one per active ticket
+    # holder, and one per rated event when ``include_ratings`` is set.
+    held = Ticket.objects.using(using).filter(is_active=True).order_by().values_list('attendee', 'event').distinct()
+    parts = [list(held.iterator())]
+    weights = [np.ones(len(parts[0]))]
+    if include_ratings:
+        rated = (
+            EventComment.objects.using(using).filter(rating__isnull=False).order_by()
+            .values('user', 'event').annotate(stars=Avg('rating')).values_list('user', 'event', 'stars')
+        )
+        rated = list(rated.iterator())
+        parts.append([(user, event) for user, event, _ in rated])
+        weights.append(np.fromiter(((stars - 3) * RATING_WEIGHT for _, _, stars in rated), dtype=np.float64, count=len(rated)))
+    pairs = np.array([pair for part in parts for pair in part], dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1], np.concatenate(weights)
+
+
+def build_neighbors(top_k=TOP_K, include_ratings=False, using=None):
+    # Recomputes every event's neighbours; only upcoming events are kept
+    # as neighbours, so this is meant to run regularly. Returns how many
+    # rows were stored.
+    user_ids, event_ids, weights = load_interactions(include_ratings, using)
+    upcoming = np.fromiter(
+        Event.objects.using(using).filter(is_active=True, start_date__gt=timezone.now())
+        .values_list('pk', flat=True).iterator(),
+        dtype=np.int64,
+    )
+    sources, targets, scores = item_neighbors(user_ids, event_ids, weights, top_k, upcoming)
+    return store_neighbors(sources, targets, scores, using)
+
+
+def store_neighbors(sources, targets, scores, using=None):
+    # Swaps the whole table in one transaction, so readers see either the
+    # old neighbours or the new ones.
+    with transaction.atomic(using=using):
+        EventNeighbor.objects.using(using).all().delete()
+        for start in range(0, len(sources), STORE_BATCH):
+            end = start + STORE_BATCH
+            EventNeighbor.objects.using(using).bulk_create([
+                EventNeighbor(event_id=int(event), neighbor_id=int(neighbor), score=float(score))
+                for event, neighbor, score in zip(sources[start:end], targets[start:end], scores[start:end])
+            ])
+    return len(sources)
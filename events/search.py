@@ -0,0 +1,261 @@
+import re
+
+from django.db import DatabaseError, connections, router
+from django.db.models import F, FloatField, Q, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Event
+
+# Snippet markers are control characters so user text can be escaped safely
+# before they are swapped for <mark> tags.
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+MAX_TERMS = 8
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query or '')[:MAX_TERMS]
+
+
+def highlight(snippet):
+    if not snippet:
+        return ''
+    html = escape(snippet)
+    return mark_safe(html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+
+class BaseSearchBackend:
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def connection(self):
+        return connections[self.alias]
+
+    def ensure_index(self):
+        pass
+
+    def index_event(self, event):
+        pass
+
+    def index_events(self, events):
+        for event in events:
+            self.index_event(event)
+
+    def remove_event(self, event_id):
+        pass
+
+    def rebuild(self):
+        return 0
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(title__icontains=term) |
+                Q(description__icontains=term) |
+                Q(location__icontains=term)
+            )
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField()),
+            search_snippet=Value('', output_field=TextField()),
+        ).order_by('start_date', 'pk')
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    table = 'events_event_fts'
+    # bm25() weights for (title, location, description).
+    weights = (10.0, 4.0, 1.0)
+    snippet_tokens = 16
+
+    def __init__(self, alias):
+        super().__init__(alias)
+        self.available = None
+
+    def ensure_index(self):
+        if self.available is not None:
+            return self.available
+        try:
+            with self.connection.cursor() as cursor:
+                existed = self.table in self.connection.introspection.table_names(cursor)
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                    "USING fts5(title, location, description, tokenize='porter unicode61')"
+                )
+        except DatabaseError:
+            # SQLite built without FTS5.
+            self.available = False
+            return False
+        self.available = True
+        if not existed:
+            self.rebuild()
+        return True
+
+    def index_event(self, event):
+        if not self.ensure_index():
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [event.pk])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, location, description) VALUES (%s, %s, %s, %s)",
+                [event.pk, event.title, event.location, event.description]
+            )
+
+    def index_events(self, events):
+        if not self.ensure_index():
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [[event.pk] for event in events])
+            self._insert(cursor, [(event.pk, event.title, event.location, event.description) for event in events])
+
+    def remove_event(self, event_id):
+        if not self.ensure_index():
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [event_id])
+
+    def rebuild(self, batch_size=1000):
+        if not self.ensure_index():
+            return 0
+        count = 0
+        rows = (
+            Event.objects.using(self.alias)
+            .order_by()
+            .values_list('pk', 'title', 'location', 'description')
+            .iterator(chunk_size=batch_size)
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self._insert(cursor, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self._insert(cursor, batch)
+                count += len(batch)
+        return count
+
+    def _insert(self, cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {self.table} (rowid, title, location, description) VALUES (%s, %s, %s, %s)",
+            rows
+        )
+
+    def match_expression(self, terms):
+        # Quote every term so user input can't inject FTS5 operators; the
+        # trailing * gives prefix matches for search-as-you-type.
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query):
+        if not self.ensure_index():
+            return super().search(queryset, query)
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        match = self.match_expression(terms)
+        table = self.table
+        event_pk = f"{Event._meta.db_table}.{Event._meta.pk.column}"
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT -bm25({table}, {weights}) FROM {table} "
+                f"WHERE {table} MATCH %s AND rowid = {event_pk}",
+                [match],
+                output_field=FloatField()
+            ),
+            search_snippet=RawSQL(
+                f"SELECT snippet({table}, -1, %s, %s, '…', {self.snippet_tokens}) FROM {table} "
+                f"WHERE {table} MATCH %s AND rowid = {event_pk}",
+                [HIGHLIGHT_START, HIGHLIGHT_END, match],
+                output_field=TextField()
+            ),
+        ).order_by('-search_rank', 'start_date', 'pk')
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    config = 'english'
+    index_name = 'events_event_search_idx'
+
+    def vector(self):
+        from django.contrib.postgres.search import SearchVector
+
+        return (
+            SearchVector('title', weight='A', config=self.config) +
+            SearchVector('location', weight='B', config=self.config) +
+            SearchVector('description', weight='C', config=self.config)
+        )
+
+    def ensure_index(self):
+        # An expression GIN index over the same vector the queries build, so
+        # Postgres keeps it in sync on every INSERT/UPDATE by itself.
+        from django.contrib.postgres.indexes import GinIndex
+
+        with self.connection.cursor() as cursor:
+            constraints = self.connection.introspection.get_constraints(cursor, Event._meta.db_table)
+        if self.index_name in constraints:
+            return True
+        with self.connection.schema_editor() as editor:
+            editor.add_index(Event, GinIndex(self.vector(), name=self.index_name))
+        return True
+
+    def rebuild(self):
+        self.ensure_index()
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"REINDEX INDEX {self.connection.ops.quote_name(self.index_name)}")
+        return Event.objects.using(self.alias).count()
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        # Same prefix semantics as the SQLite backend: every term, as a prefix.
+        search_query = SearchQuery(
+            ' & '.join(f"{term}:*" for term in terms),
+            search_type='raw',
+            config=self.config
+        )
+        vector = self.vector()
+        return queryset.annotate(
+            search_document=vector,
+        ).filter(
+            search_document=search_query
+        ).annotate(
+            search_rank=SearchRank(vector, search_query),
+            search_snippet=SearchHeadline(
+                'description',
+                search_query,
+                config=self.config,
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_END,
+                max_words=25,
+                min_words=10
+            ),
+        ).order_by(F('search_rank').desc(), 'start_date', 'pk')
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backends = {}
+
+
+def get_search_backend(using=None):
+    alias = using or router.db_for_read(Event)
+    if alias not in _backends:
+        vendor = connections[alias].vendor
+        _backends[alias] = BACKENDS.get(vendor, BaseSearchBackend)(alias)
+    return _backends[alias]
@@ -0,0 +1,202 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, QuerySet, Sum
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    CustomUser, DailyStat, Event, EventComment, Notification, PlatformCounter, Ticket, publish_availability, record_ticket_sales
+)
+from .images import HASHED_IMAGES, content_hash, prewarm_derivatives
+from .notifications import adjust_unread_count, announce_notifications, invalidate_unread_counts
+from .search import get_search_backend
+from .stats import as_day, record_event_state, user_type_key
+
+
+def _deleted_with_event(origin):
+    if isinstance(origin, Event):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is Event
+
+
+@receiver(pre_save, sender=Ticket)
+def remember_ticket_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if raw or instance._state.adding:
+        return
+    instance._previous_state = (
+        Ticket.objects.filter(pk=instance.pk).values_list('event_id', 'is_active', 'price').first()
+    )
+
+
+@receiver(post_save, sender=Ticket)
+def update_tickets_sold_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    if previous == (instance.event_id, instance.is_active, instance.price):
+        return
+    if previous and previous[1]:
+        Event.adjust_tickets_sold(previous[0], -1, -previous[2])
+    if instance.is_active:
+        Event.adjust_tickets_sold(instance.event_id, 1, instance.price)
+
+
+@receiver(post_delete, sender=Ticket)
+def update_tickets_sold_on_delete(sender, instance, origin=None, **kwargs):
+    if instance.is_active and not _deleted_with_event(origin):
+        Event.adjust_tickets_sold(instance.event_id, -1, -instance.price)
+
+
+def _comment_stats(state, sign):
+    event_id, rating = state
+    return event_id, (sign, sign if rating is not None else 0, sign * (rating or 0))
+
+
+@receiver(post_save, sender=EventComment)
+def update_comment_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_state', None)
+    current = (instance.event_id, instance.rating)
+    instance._loaded_state = current
+    if created:
+        states = [(current, 1)]
+    elif previous:
+        states = [(previous, -1), (current, 1)]
+    else:
+        # Saved without being loaded: the old rating is unknown.
+        states = [(current, 0)]
+    changes = {}
+    for state, sign in states:
+        event_id, deltas = _comment_stats(state, sign)
+        changes[event_id] = [a + b for a, b in zip(changes.get(event_id, (0, 0, 0)), deltas)]
+    for event_id, deltas in changes.items():
+        Event.adjust_comment_stats(event_id, *deltas, using=kwargs.get('using'))
+
+
+@receiver(post_delete, sender=EventComment)
+def update_comment_stats_on_delete(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_event(origin):
+        event_id, deltas = _comment_stats((instance.event_id, instance.rating), -1)
+        Event.adjust_comment_stats(event_id, *deltas, using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_count_on_save(sender, instance, created, **kwargs):
+    if created:
+        if not instance.is_read:
+            adjust_unread_count(instance.user_id, 1, using=kwargs.get('using'))
+        announce_notifications([instance.user_id])
+    else:
+        invalidate_unread_counts([instance.user_id], using=kwargs.get('using'))
+
+
+@receiver(post_delete, sender=Notification)
+def update_unread_count_on_delete(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread_count(instance.user_id, -1, using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=Event)
+def index_event(sender, instance, **kwargs):
+    get_search_backend(kwargs.get('using')).index_event(instance)
+
+
+@receiver(post_save, sender=Event)
+def publish_event_availability(sender, instance, created, raw=False, **kwargs):
+    # Capacity or is_active may have changed.
+    if not created and not raw:
+        publish_availability(instance.pk, using=kwargs.get('using'))
+
+
+@receiver(post_delete, sender=Event)
+def unindex_event(sender, instance, **kwargs):
+    get_search_backend(kwargs.get('using')).remove_event(instance.pk)
+
+
+@receiver(post_save, sender=Event)
+def update_event_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_state', None)
+    current = (instance.is_active, instance.start_date)
+    instance._loaded_state = current
+    if created:
+        PlatformCounter.bump(events_total=1)
+        DailyStat.bump(day=as_day(instance.created_at), events_created=1)
+    elif previous is None or previous == current:
+        return
+    else:
+        record_event_state(previous, -1)
+    record_event_state(current, 1)
+
+
+@receiver(post_delete, sender=Event)
+def update_event_stats_on_delete(sender, instance, **kwargs):
+    PlatformCounter.bump(events_total=-1)
+    record_event_state(getattr(instance, '_loaded_state', (instance.is_active, instance.start_date)), -1)
+
+
+@receiver(pre_delete, sender=Event)
+def update_ticket_stats_on_event_delete(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_event(origin):
+        return
+    # Its tickets go with it without touching the counters, so take back
+    # what they were sold for.
+    sold = Ticket.objects.filter(event_id=instance.pk, is_active=True).aggregate(
+        count=Count('pk'), revenue=Sum('price')
+    )
+    if sold['count']:
+        record_ticket_sales(-sold['count'], -sold['revenue'])
+
+
+@receiver(post_save, sender=CustomUser)
+def update_user_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_user_type', None)
+    instance._loaded_user_type = instance.user_type
+    if created:
+        PlatformCounter.bump(**{'users_total': 1, user_type_key(instance.user_type): 1})
+        DailyStat.bump(day=as_day(instance.date_joined), users_joined=1)
+    elif previous is not None and previous != instance.user_type:
+        PlatformCounter.bump(**{user_type_key(previous): -1, user_type_key(instance.user_type): 1})
+
+
+@receiver(post_delete, sender=CustomUser)
+def update_user_stats_on_delete(sender, instance, **kwargs):
+    user_type = getattr(instance, '_loaded_user_type', None) or instance.user_type
+    PlatformCounter.bump(**{'users_total': -1, user_type_key(user_type): -1})
+
+
+def create_search_index(sender, using, **kwargs):
+    get_search_backend(using).ensure_index()
+
+
+
+@receiver(pre_save, sender=Event)
+@receiver(pre_save, sender=CustomUser)
+def hash_uploaded_image(sender, instance, raw=False, update_fields=None, **kwargs):
+    # New uploads are hashed before the file is written to storage; rows
+    # saved before hashing existed get theirs on their next full save.
+    instance._uploaded_image = None
+    field, hash_field = HASHED_IMAGES[sender]
+    if raw or (update_fields is not None and field not in update_fields):
+        return
+    field_file = getattr(instance, field)
+    if not field_file:
+        setattr(instance, hash_field, '')
+    elif not field_file._committed or not getattr(instance, hash_field):
+        setattr(instance, hash_field, content_hash(field_file))
+        instance._uploaded_image = field_file
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=CustomUser)
+def prewarm_uploaded_image(sender, instance, raw=False, **kwargs):
+    field_file = getattr(instance, '_uploaded_image', None)
+    if field_file:
+        digest = getattr(instance, HASHED_IMAGES[sender][1])
+        transaction.on_commit(partial(prewarm_derivatives, field_file.name, digest), using=kwargs.get('using'))
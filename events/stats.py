@@ -0,0 +1,144 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateTimeField, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CustomUser, DailyStat, Event, PlatformCounter, Ticket
+
+# Totals kept in PlatformCounter. Users are also counted per user_type under
+# 'users_type_<n>'.
+COUNTER_KEYS = ('events_total', 'events_active', 'users_total', 'tickets_sold', 'revenue')
+# Per-day series kept in DailyStat. 'events_starting' is keyed by start date
+# and only counts active events, so upcoming/past totals are a range sum.
+DAILY_KEYS = ('events_created', 'events_starting', 'users_joined', 'tickets_sold', 'revenue')
+
+
+def user_type_key(user_type):
+    return f'users_type_{user_type}'
+
+
+def as_day(value):
+    # Accepts whatever was assigned to the field, including unsaved strings.
+    value = DateTimeField().to_python(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return timezone.localdate(value)
+
+
+def _number(key, value):
+    value = value or 0
+    return Decimal(value).quantize(Decimal('0.01')) if key == 'revenue' else int(value)
+
+
+def record_event_state(state, delta):
+    is_active, start_date = state
+    if is_active:
+        PlatformCounter.bump(events_active=delta)
+        DailyStat.bump(day=as_day(start_date), events_starting=delta)
+
+
+def record_created_events(events):
+    # For bulk_create(), which skips the post_save receivers.
+    PlatformCounter.bump(events_total=len(events))
+    DailyStat.bump(events_created=len(events))
+    starting = Counter(as_day(event.start_date) for event in events if event.is_active)
+    PlatformCounter.bump(events_active=sum(starting.values()))
+    for day, count in starting.items():
+        DailyStat.bump(day=day, events_starting=count)
+
+
+def get_platform_stats():
+    stats = {key: _number(key, 0) for key in COUNTER_KEYS}
+    for value, _ in CustomUser.USER_TYPE_CHOICES:
+        stats[user_type_key(value)] = 0
+    for row in PlatformCounter.objects.values('key').annotate(total=Sum('value')).order_by():
+        stats[row['key']] = _number(row['key'], row['total'])
+
+    today = timezone.localdate()
+    window = DailyStat.objects.filter(
+        key__in=('events_starting', 'users_joined')
+    ).values('key').annotate(
+        upcoming=Sum('value', filter=Q(day__gte=today)),
+        last_week=Sum('value', filter=Q(day__gte=today - timedelta(days=6))),
+    ).order_by()
+    window = {row['key']: row for row in window}
+    stats['upcoming_events'] = _number('', window.get('events_starting', {}).get('upcoming'))
+    stats['past_events'] = max(stats['events_active'] - stats['upcoming_events'], 0)
+    stats['users_joined_last_week'] = _number('', window.get('users_joined', {}).get('last_week'))
+    return stats
+
+
+def get_daily_stats(days=14):
+    today = timezone.localdate()
+    first = today - timedelta(days=days - 1)
+    series = {
+        first + timedelta(days=offset): {key: _number(key, 0) for key in DAILY_KEYS}
+        for offset in range(days)
+    }
+    rows = DailyStat.objects.filter(
+        day__gte=first, day__lte=today, key__in=DAILY_KEYS
+    ).values('day', 'key').annotate(total=Sum('value')).order_by()
+    for row in rows:
+        series[row['day']][row['key']] = _number(row['key'], row['total'])
+    return [dict(day=day, **values) for day, values in sorted(series.items(), reverse=True)]
+
+
+def compute_counters():
+    counters = {
+        'events_total': Event.objects.count(),
+        'events_active': Event.objects.filter(is_active=True).count(),
+        'users_total': CustomUser.objects.count(),
+    }
+    for row in CustomUser.objects.values('user_type').annotate(count=Count('pk')).order_by():
+        counters[user_type_key(row['user_type'])] = row['count']
+    tickets = Ticket.objects.filter(is_active=True).aggregate(sold=Count('pk'), revenue=Sum('price'))
+    counters['tickets_sold'] = tickets['sold']
+    counters['revenue'] = tickets['revenue'] or 0
+    return counters
+
+
+def compute_daily():
+    daily = defaultdict(int)
+
+    def collect(queryset, date_field, **aggregates):
+        rows = queryset.annotate(day=TruncDate(date_field)).values('day').annotate(**aggregates).order_by()
+        for row in rows:
+            for key in aggregates:
+                daily[(row['day'], key)] += row[key] or 0
+
+    collect(Event.objects.all(), 'created_at', events_created=Count('pk'))
+    collect(Event.objects.filter(is_active=True), 'start_date', events_starting=Count('pk'))
+    collect(CustomUser.objects.all(), 'date_joined', users_joined=Count('pk'))
+    # Daily sales are gross: tickets cancelled later still count on the day they were bought.
+    collect(Ticket.objects.all(), 'purchase_date', tickets_sold=Count('pk'), revenue=Sum('price'))
+    return daily
+
+
+def reconcile(dry_run=False):
+    # Rebuilds both tables from the source rows and returns the counters
+    # that had drifted as {key: (stored, actual)}. Bumps committed while this
+    # runs are overwritten, so schedule it off-peak.
+    with transaction.atomic():
+        stored = get_platform_stats()
+        actual = compute_counters()
+        drift = {
+            key: (stored.get(key, 0), _number(key, value))
+            for key, value in actual.items()
+            if stored.get(key, 0) != _number(key, value)
+        }
+        if dry_run:
+            return drift
+        PlatformCounter.objects.all().delete()
+        PlatformCounter.objects.bulk_create([
+            PlatformCounter(key=key, value=value) for key, value in actual.items() if value
+        ])
+        DailyStat.objects.all().delete()
+        DailyStat.objects.bulk_create([
+            DailyStat(day=day, key=key, value=value)
+            for (day, key), value in compute_daily().items() if value
+        ], batch_size=1000)
+    return drift
@@ -0,0 +1,14 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from events.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def event_cards(events, style):
+    # {% event_cards events 'list' %}
+    # The cards for a page of events, each in its own cached fragment; see
+    # events.cards.
+    return mark_safe(''.join(render_cards(style, list(events))))
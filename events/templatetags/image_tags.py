@@ -0,0 +1,31 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from events.images import IMAGE_PRESETS, derivative_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, preset, **attrs):
+    # {% responsive_image event.image 'card' alt=event.title class='card-img-top' %}
+    # An <img> with a WebP srcset for the preset's widths. Images saved
+    # before they were hashed fall back to the original upload.
+    if not field_file:
+        return ''
+    attrs.setdefault('alt', '')
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    digest = getattr(field_file.instance, f'{field_file.field.name}_hash', '')
+    if not digest:
+        return format_html('<img src="{}"{}>', field_file.url, flatatt(attrs))
+
+    config = IMAGE_PRESETS[preset]
+    widths = config['widths']
+    sizes = config['sizes'] or f"{attrs.get('width', widths[0])}px"
+    srcset = ', '.join(f'{derivative_url(digest, width)} {width}w' for width in widths)
+    return format_html(
+        '<img src="{}" srcset="{}" sizes="{}"{}>',
+        derivative_url(digest, widths[len(widths) // 2]), srcset, sizes, flatatt(attrs)
+    )
@@ -1,12 +1,14 @@
 from django import template
 
+from events.notifications import get_unread_count
+
 register = template.Library()
 
 @register.filter
 def has_unread_notifications(user):
-    return user.notifications.filter(is_read=False).exists()
+    return get_unread_count(user) > 0
 
 
 @register.filter
 def unread_notifications_count(user):
-    return user.notifications.filter(is_read=False).count()
\ No newline at end of file
+    return get_unread_count(user)
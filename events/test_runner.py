@@ -0,0 +1,26 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    # The file cache outlives the process, so each run gets an empty
+    # directory of its own; processes the tests start are pointed at it
+    # through CACHE_LOCATION.
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='events-test-cache-')
+        self.cache_override = override_settings(CACHES={
+            alias: {**config, 'LOCATION': os.path.join(self.cache_dir, alias)}
+            for alias, config in settings.CACHES.items()
+        })
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
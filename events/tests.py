@@ -1,7 +1,51 @@
-from django.test import TestCase, Client
+import asyncio
+from datetime import timedelta
+import csv
+import json
+import os
+import hashlib
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.conf import settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Event, EventCategory, Ticket
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.template import Context, Template
+from django.utils import timezone
+from PIL import Image
+from .images import DERIVATIVE_WIDTHS, IMAGE_PRESETS, derivative_name, submit_derivative
+from .imports import EventImporter
+from .jobs import claim_next_job, enqueue, requeue_stale_jobs, run_pending_jobs
+from .live import InMemoryBroker, availability_hub, get_notification_broker
+from . import page_cache
+from .middleware import QueryInstrumentationMiddleware
+from .models import Event, EventCategory, EventComment, EventNeighbor, Ticket, Notification, Job, PlatformCounter, TicketNumberNode
+from .cards import get_card_cache_stats
+from .context_processors import notifications as notifications_context
+from .notifications import get_unread_count
+from .page_cache import cached_page
+from .pagination import CursorPaginator
+from . import recommendations
+from .recommendations import item_neighbors
+from .search import get_search_backend, highlight, HIGHLIGHT_START, HIGHLIGHT_END
+from .stats import compute_counters, get_daily_stats, get_platform_stats, reconcile
+from .ticket_numbers import NODE_LEASE_RENEW_AFTER, SnowflakeGenerator
+from .urls import urlpatterns
 
 User = get_user_model()
 
@@ -131,4 +175,1922 @@ class AuthenticationTests(TestCase):
             'user_type': 1
         })
         self.assertEqual(response.status_code, 302)
-        self.assertTrue(User.objects.filter(username='newuser').exists())
\ No newline at end of file
+        self.assertTrue(User.objects.filter(username='newuser').exists())
+
+class TicketCounterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(
+            username='organizer',
+            password='testpass123',
+            user_type=2
+        )
+        cls.attendee = User.objects.create_user(
+            username='attendee',
+            password='testpass123',
+            user_type=1
+        )
+        cls.event = Event.objects.create(
+            title='Counted Event',
+            description='Test Description',
+            location='Test Location',
+            start_date=timezone.now() + timedelta(days=7),
+            end_date=timezone.now() + timedelta(days=8),
+            organizer=cls.organizer,
+            capacity=10,
+            price=20.00
+        )
+
+    def test_counter_follows_ticket_lifecycle(self):
+        ticket = Ticket.objects.create(event=self.event, attendee=self.attendee)
+        Ticket.objects.create(event=self.event, attendee=self.attendee)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 2)
+
+        ticket.is_active = False
+        ticket.save()
+        ticket.delete()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 1)
+
+        Ticket.objects.filter(event=self.event).deactivate()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 0)
+        self.assertEqual(self.event.available_tickets, 10)
+
+    def test_available_tickets_does_not_query(self):
+        Ticket.objects.create(event=self.event, attendee=self.attendee)
+        event = Event.objects.get(pk=self.event.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(event.available_tickets, 9)
+
+    def test_stale_event_save_keeps_counter(self):
+        stale = Event.objects.get(pk=self.event.pk)
+        Ticket.objects.create(event=self.event, attendee=self.attendee)
+        stale.title = 'Renamed'
+        stale.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 1)
+        self.assertEqual(self.event.title, 'Renamed')
+
+    def test_cancel_event_deactivates_tickets(self):
+        Ticket.objects.create(event=self.event, attendee=self.attendee)
+        self.client.login(username='organizer', password='testpass123')
+        response = self.client.post(reverse('event_delete', args=[self.event.pk]))
+        self.assertEqual(response.status_code, 302)
+        run_pending_jobs()
+        self.event.refresh_from_db()
+        self.assertFalse(self.event.is_active)
+        self.assertEqual(self.event.tickets_sold, 0)
+        self.assertTrue(Notification.objects.filter(
+            user=self.attendee,
+            notification_type='event_cancellation'
+        ).exists())
+
+    def test_reconcile_command_fixes_drift(self):
+        Ticket.objects.create(event=self.event, attendee=self.attendee)
+        Event.objects.filter(pk=self.event.pk).update(tickets_sold=7)
+        out = StringIO()
+        call_command('reconcile_ticket_counts', stdout=out)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 1)
+        self.assertIn('1 event(s) fixed', out.getvalue())
+
+
+class TicketPurchaseTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(
+            username='organizer',
+            password='testpass123',
+            user_type=2
+        )
+        cls.attendee = User.objects.create_user(
+            username='attendee',
+            password='testpass123',
+            user_type=1
+        )
+        cls.event = Event.objects.create(
+            title='Small Event',
+            description='Test Description',
+            location='Test Location',
+            start_date=timezone.now() + timedelta(days=7),
+            end_date=timezone.now() + timedelta(days=8),
+            organizer=cls.organizer,
+            capacity=3,
+            price=10.00
+        )
+
+    def test_purchase_reserves_and_bulk_creates(self):
+        tickets = Ticket.objects.purchase(self.event, self.attendee, 3)
+        self.assertEqual(len(tickets), 3)
+        self.assertEqual(len({t.ticket_number for t in tickets}), 3)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 3)
+
+    def test_purchase_rejects_over_capacity(self):
+        Ticket.objects.purchase(self.event, self.attendee, 2)
+        with self.assertRaisesMessage(ValidationError, 'Only 1 tickets available.'):
+            Ticket.objects.purchase(self.event, self.attendee, 2)
+        self.assertEqual(Ticket.objects.filter(event=self.event).count(), 2)
+
+    def test_purchase_view(self):
+        self.client.login(username='attendee', password='testpass123')
+        response = self.client.post(reverse('purchase_ticket', args=[self.event.pk]), {'quantity': 2})
+        self.assertRedirects(response, reverse('user_dashboard'))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 2)
+
+
+class TicketPurchaseStressTest(TransactionTestCase):
+    def test_concurrent_purchases_never_oversell(self):
+        out = StringIO()
+        call_command('stress_purchase', threads=8, capacity=40, stdout=out)
+        self.assertIn('Capacity held.', out.getvalue())
+        self.assertIn('purchases=40 ', out.getvalue())
+
+
+class TicketNumberGeneratorTest(TestCase):
+    def test_numbers_are_unique_and_fixed_width(self):
+        numbers = SnowflakeGenerator(node_id=1).generate(10000)
+        self.assertEqual(len(set(numbers)), 10000)
+        self.assertEqual({len(number) for number in numbers}, {15})
+        self.assertTrue(all(number.startswith('TK') for number in numbers))
+
+    def test_nodes_never_collide(self):
+        first = SnowflakeGenerator(node_id=1).generate(2000)
+        second = SnowflakeGenerator(node_id=2).generate(2000)
+        self.assertFalse(set(first) & set(second))
+
+    def test_numbers_sort_by_issue_order(self):
+        numbers = SnowflakeGenerator(node_id=3).generate(5000)
+        self.assertEqual(numbers, sorted(numbers))
+
+    @override_settings(TICKET_NUMBER_NODE_ID=None)
+    def test_node_ids_are_leased(self):
+        first, second = SnowflakeGenerator(), SnowflakeGenerator()
+        self.assertNotEqual(first.node_id, second.node_id)
+        self.assertEqual(TicketNumberNode.objects.count(), 2)
+
+        # An expired lease goes to the next process, and its old holder
+        # claims another when it next renews.
+        TicketNumberNode.objects.filter(node_id=first.node_id).update(renewed_at=timezone.now() - timedelta(hours=1))
+        third = SnowflakeGenerator()
+        self.assertEqual(third.node_id, first.node_id)
+        first._renewed_at -= NODE_LEASE_RENEW_AFTER.total_seconds()
+        first.generate(1)
+        self.assertNotIn(first.node_id, (second.node_id, third.node_id))
+
+        # So does a forked worker.
+        second._pid = -1
+        old_node = second.node_id
+        second.generate(1)
+        self.assertNotEqual(second.node_id, old_node)
+
+        with mock.patch.object(SnowflakeGenerator, 'MAX_NODE', 3):
+            with self.assertRaises(ImproperlyConfigured):
+                SnowflakeGenerator()
+
+    def test_node_id_is_validated(self):
+        for node_id in (-1, 1024, 'host'):
+            with self.assertRaises(ImproperlyConfigured):
+                SnowflakeGenerator(node_id=node_id)
+        with override_settings(TICKET_NUMBER_NODE_ID='7'):
+            self.assertEqual(SnowflakeGenerator().node_id, 7)
+
+    def test_purchase_retries_clashing_numbers(self):
+        organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        event = Event.objects.create(
+            title='Numbered Event', description='Test Description', location='Test Location',
+            start_date=timezone.now() + timedelta(days=7), end_date=timezone.now() + timedelta(days=8),
+            organizer=organizer, capacity=5
+        )
+        taken = Ticket.objects.purchase(event, organizer, 1)[0].ticket_number
+        generator = mock.Mock()
+        generator.generate.side_effect = [[taken], ['TK0000000000001']]
+        with mock.patch('events.models.get_ticket_number_generator', return_value=generator):
+            tickets = Ticket.objects.purchase(event, organizer, 1)
+        self.assertEqual(tickets[0].ticket_number, 'TK0000000000001')
+        event.refresh_from_db()
+        self.assertEqual(event.tickets_sold, 2)
+
+        generator.generate.side_effect = lambda count: [taken]
+        with mock.patch('events.models.get_ticket_number_generator', return_value=generator):
+            self.client.force_login(organizer)
+            response = self.client.post(reverse('purchase_ticket', args=[event.pk]), {'quantity': 1})
+        self.assertIn('could not be issued', response.context['form'].non_field_errors()[0])
+        event.refresh_from_db()
+        self.assertEqual(event.tickets_sold, 2)
+
+    @override_settings(TICKET_NUMBER_NODE_ID=None)
+    def test_purchase_without_node_id(self):
+        organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        event = Event.objects.create(
+            title='Numbered Event', description='Test Description', location='Test Location',
+            start_date=timezone.now() + timedelta(days=7), end_date=timezone.now() + timedelta(days=8),
+            organizer=organizer, capacity=5
+        )
+        self.client.force_login(organizer)
+        with mock.patch.object(SnowflakeGenerator, 'MAX_NODE', 0):
+            TicketNumberNode.objects.create(node_id=0, holder='other', renewed_at=timezone.now())
+            with self.assertLogs('events.views', 'ERROR'):
+                response = self.client.post(reverse('purchase_ticket', args=[event.pk]), {'quantity': 1})
+        self.assertIn('could not be issued', response.context['form'].non_field_errors()[0])
+        event.refresh_from_db()
+        self.assertEqual(event.tickets_sold, 0)
+
+    def test_single_save_uses_generator(self):
+        organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        event = Event.objects.create(
+            title='Numbered Event',
+            description='Test Description',
+            location='Test Location',
+            start_date=timezone.now() + timedelta(days=7),
+            end_date=timezone.now() + timedelta(days=8),
+            organizer=organizer,
+            capacity=5
+        )
+        ticket = Ticket.objects.create(event=event, attendee=organizer)
+        self.assertRegex(ticket.ticket_number, r'^TK[0-9A-HJKMNP-TV-Z]{13}$')
+
+
+class EventSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        start = timezone.now() + timedelta(days=7)
+
+        def make(title, description, location='Sofia'):
+            return Event.objects.create(
+                title=title,
+                description=description,
+                location=location,
+                start_date=start,
+                end_date=start + timedelta(hours=3),
+                organizer=cls.organizer,
+                capacity=10
+            )
+
+        cls.jazz_title = make('Jazz Night', 'An evening of live music.')
+        cls.jazz_body = make('Open Air Evening', 'Some jazz standards between other sets.')
+        cls.chess = make('Chess Open', 'Rapid chess tournament.', location='Plovdiv')
+
+    def search(self, query):
+        return list(get_search_backend().search(Event.objects.all(), query))
+
+    def test_results_are_ranked_by_relevance(self):
+        self.assertEqual(self.search('jazz'), [self.jazz_title, self.jazz_body])
+
+    def test_prefix_and_location_match(self):
+        self.assertEqual(self.search('plov'), [self.chess])
+        self.assertEqual(self.search('"jaz" -*('), [self.jazz_title, self.jazz_body])
+        self.assertEqual(self.search('***'), [])
+
+    def test_index_follows_save_and_delete(self):
+        self.chess.title = 'Go Tournament'
+        self.chess.description = 'Rapid go games.'
+        self.chess.save()
+        self.assertEqual(self.search('chess'), [])
+        self.assertEqual(self.search('tournament'), [self.chess])
+        self.chess.delete()
+        self.assertEqual(self.search('tournament'), [])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        snippet = f"<b>{HIGHLIGHT_START}jazz{HIGHLIGHT_END}</b>"
+        self.assertEqual(highlight(snippet), '&lt;b&gt;<mark>jazz</mark>&lt;/b&gt;')
+
+    def test_list_view_shows_highlighted_snippet(self):
+        response = self.client.get(reverse('event_list'), {'search': 'standards'})
+        self.assertEqual(list(response.context['events']), [self.jazz_body])
+        self.assertContains(response, '<mark>standards</mark>')
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 3 event(s)', out.getvalue())
+        self.assertEqual(self.search('chess'), [self.chess])
+
+
+class CursorPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        start = timezone.now() + timedelta(days=1)
+        # Pairs of events share a start date so the pk tie-breaker matters.
+        cls.events = [
+            Event.objects.create(
+                title=f'Event {i:02d}',
+                description='Test Description',
+                location='Test Location',
+                start_date=start + timedelta(hours=i // 2),
+                end_date=start + timedelta(hours=i // 2 + 1),
+                organizer=cls.organizer,
+                capacity=10
+            )
+            for i in range(25)
+        ]
+
+    def test_walks_forward_and_back_without_gaps(self):
+        paginator = CursorPaginator(Event.objects.all(), 9)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [9, 9, 7])
+        self.assertEqual([e for page in pages for e in page], self.events)
+        self.assertFalse(pages[0].has_previous())
+
+        back = paginator.page(pages[2].previous_cursor)
+        self.assertEqual(list(back), self.events[9:18])
+        first = paginator.page(back.previous_cursor)
+        self.assertEqual(list(first), self.events[:9])
+        self.assertFalse(first.has_previous())
+
+    def test_descending_ordering(self):
+        paginator = CursorPaginator(Event.objects.all(), 10, ('-start_date', '-pk'))
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(list(first) + list(second), self.events[::-1][:20])
+
+    def test_list_view_uses_cursor_without_count(self):
+        response = self.client.get(reverse('event_list'))
+        page = response.context['page_obj']
+        self.assertTrue(page.is_cursor_page)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('event_list'), {'cursor': page.next_cursor})
+        self.assertEqual(list(response.context['events']), self.events[9:18])
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'].upper()])
+
+    def test_page_number_fallback_and_invalid_cursor(self):
+        response = self.client.get(reverse('event_list'), {'page': 2})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(list(response.context['events']), self.events[9:18])
+        response = self.client.get(reverse('event_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class UnreadNotificationCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='testpass123', user_type=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(
+                user=self.user,
+                notification_type='new_event',
+                message='Hello'
+            )
+
+    def test_cached_count_is_adjusted_without_queries(self):
+        self.notify()
+        self.assertEqual(get_unread_count(self.user), 1)
+        self.notify()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user), 2)
+
+    def test_context_processor_is_request_scoped(self):
+        self.notify()
+        request = RequestFactory().get('/')
+        request.user = self.user
+        get_unread_count(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications_context(request)['unread_notifications_count'], 1)
+            cache.clear()
+            self.assertEqual(notifications_context(request)['unread_notifications_count'], 1)
+
+    def test_mark_read_views_update_count(self):
+        first = self.notify()
+        self.notify()
+        self.client.login(username='reader', password='testpass123')
+        self.assertEqual(get_unread_count(self.user), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('mark_notification_read', args=[first.pk]))
+            self.client.get(reverse('mark_notification_read', args=[first.pk]))
+        self.assertEqual(get_unread_count(self.user), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('mark_all_notifications_read'))
+        self.assertEqual(get_unread_count(self.user), 0)
+
+    def test_change_during_a_recount_is_not_overwritten(self):
+        add = cache.add
+
+        def commit_then_add(key, *args):
+            if key.startswith('events:unread-notifications:'):
+                # A notification commits after the count was read.
+                self.notify()
+            return add(key, *args)
+
+        with mock.patch.object(cache, 'add', side_effect=commit_then_add):
+            self.assertEqual(get_unread_count(self.user), 0)
+        self.assertEqual(get_unread_count(self.user), 1)
+
+    def test_rolled_back_notifications_leave_the_count(self):
+        self.notify()
+        self.assertEqual(get_unread_count(self.user), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Notification.objects.create(user=self.user, notification_type='new_event', message='Lost')
+                    raise ValidationError('rolled back')
+            except ValidationError:
+                pass
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user), 1)
+
+    def test_badge_rendered_from_context(self):
+        self.notify()
+        self.client.login(username='reader', password='testpass123')
+        response = self.client.get(reverse('event_list'))
+        self.assertEqual(response.context['unread_notifications_count'], 1)
+        self.assertContains(response, 'notification-badge')
+
+
+class JobQueueTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.attendees = [
+            User.objects.create_user(username=f'attendee{i}', password='testpass123', user_type=1)
+            for i in range(5)
+        ]
+        cls.event = Event.objects.create(
+            title='Cancelled Event',
+            description='Test Description',
+            location='Test Location',
+            start_date=timezone.now() + timedelta(days=7),
+            end_date=timezone.now() + timedelta(days=8),
+            organizer=cls.organizer,
+            capacity=50
+        )
+        for attendee in cls.attendees:
+            Ticket.objects.purchase(cls.event, attendee, 2)
+
+    def test_cancel_enqueues_instead_of_notifying_inline(self):
+        self.client.login(username='organizer', password='testpass123')
+        self.client.post(reverse('event_delete', args=[self.event.pk]))
+        job = Job.objects.get()
+        self.assertEqual((job.kind, job.status, job.created_by), ('event_cancellation', 'pending', self.organizer))
+        self.assertFalse(Notification.objects.filter(notification_type='event_cancellation').exists())
+        response = self.client.get(reverse('my_events'))
+        self.assertContains(response, 'Event cancellation in progress')
+
+    def test_worker_notifies_each_attendee_once(self):
+        job = enqueue('event_cancellation', created_by=self.organizer, event_id=self.event.pk)
+        out = StringIO()
+        call_command('run_jobs', burst=True, stdout=out)
+        self.assertIn('Processed 1 job(s).', out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.total), ('done', 5, 5))
+        for attendee in self.attendees:
+            self.assertEqual(attendee.notifications.count(), 1)
+        self.assertTrue(self.organizer.notifications.filter(message__contains='sent to 5 attendee(s)').exists())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, 0)
+
+    def test_retry_resumes_from_checkpoint(self):
+        job = enqueue('event_cancellation', event_id=self.event.pk)
+        third = sorted(a.pk for a in self.attendees)[2]
+        Job.objects.filter(pk=job.pk).update(total=5, progress=3, checkpoint={'last_user_id': third})
+        run_pending_jobs()
+        self.assertEqual(Notification.objects.filter(notification_type='event_cancellation').exclude(user=self.organizer).count(), 2)
+
+    def test_unknown_job_kind_fails(self):
+        job = enqueue('no_such_job')
+        with self.assertLogs('events.jobs', 'ERROR'):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('No handler registered', job.error)
+
+
+class EventUpdateNotificationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.attendees = [
+            User.objects.create_user(username=f'attendee{i}', password='testpass123', user_type=1)
+            for i in range(3)
+        ]
+        start = timezone.now().replace(second=0, microsecond=0) + timedelta(days=7)
+        cls.event = Event.objects.create(
+            title='Updated Event',
+            description='A description that is comfortably longer than fifty characters.',
+            location='Old Hall',
+            start_date=start,
+            end_date=start + timedelta(hours=2),
+            organizer=cls.organizer,
+            capacity=50,
+            price=10
+        )
+        for attendee in cls.attendees:
+            Ticket.objects.purchase(cls.event, attendee, 2)
+
+    def setUp(self):
+        self.client.login(username='organizer', password='testpass123')
+
+    def update(self, **overrides):
+        local_start = timezone.localtime(self.event.start_date)
+        data = {
+            'title': self.event.title,
+            'description': self.event.description,
+            'location': self.event.location,
+            'start_date': local_start.strftime('%Y-%m-%dT%H:%M'),
+            'end_date': (local_start + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M'),
+            'event_type': 'public',
+            'capacity': 50,
+            'price': '10.00',
+        }
+        data.update(overrides)
+        response = self.client.post(reverse('event_update', args=[self.event.pk]), data)
+        self.assertEqual(response.status_code, 302)
+
+    def test_cosmetic_change_emits_nothing(self):
+        self.update(title='New Title')
+        self.assertFalse(Job.objects.exists())
+
+    def test_material_changes_are_coalesced(self):
+        self.update(location='New Hall')
+        self.update(location='Newest Hall', price='12.50')
+        job = Job.objects.get(kind='event_update')
+        self.assertEqual(job.payload['changes'], {
+            'location': ['Old Hall', 'Newest Hall'],
+            'price': ['$10.00', '$12.50'],
+        })
+        self.update(location='Old Hall', price='10.00')
+        self.assertFalse(Job.objects.exists())
+
+    def test_one_notice_per_attendee(self):
+        self.update(location='New Hall')
+        run_pending_jobs()
+        for attendee in self.attendees:
+            notices = list(attendee.notifications.filter(notification_type='event_update'))
+            self.assertEqual(len(notices), 1)
+            self.assertIn('location changed from Old Hall to New Hall', notices[0].message)
+
+
+class UserDashboardQueryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.attendee = User.objects.create_user(username='attendee', password='testpass123', user_type=1)
+        now = timezone.now()
+        cls.events = Event.objects.bulk_create([
+            Event(
+                title=f'Event {i}',
+                description='Test Description',
+                location='Test Location',
+                start_date=now + timedelta(days=i - 50, hours=12),
+                end_date=now + timedelta(days=i - 50, hours=14),
+                organizer=cls.organizer,
+                capacity=10,
+                price=5
+            )
+            for i in range(100)
+        ])
+        for event in cls.events:
+            Ticket.objects.purchase(event, cls.attendee, 2)
+            EventComment.objects.create(event=event, user=cls.attendee, content='Nice', rating=4)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_organizer_dashboard_query_count(self):
+        self.client.login(username='organizer', password='testpass123')
+        # session, user, events with stats, unread notifications, unread count
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('user_dashboard'))
+        events = response.context['organized_events']
+        self.assertEqual(len(events), 100)
+        self.assertEqual(len(response.context['past_events']), 50)
+        self.assertEqual((events[0].tickets_sold, events[0].revenue, events[0].comments_total), (2, 10, 1))
+
+    def test_attendee_dashboard_query_count(self):
+        self.client.login(username='attendee', password='testpass123')
+        # session, user, held events, unread notifications, recommendations,
+        # unread count
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('user_dashboard'))
+        self.assertEqual(len(response.context['upcoming_events']), 50)
+        self.assertEqual(len(response.context['past_events']), 50)
+        self.assertEqual(response.context['upcoming_events'][0].tickets_held, 2)
+
+
+class PlatformStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='testpass123', user_type=3)
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.attendee = User.objects.create_user(username='attendee', password='testpass123', user_type=1)
+        now = timezone.now()
+        cls.upcoming = Event.objects.create(
+            title='Upcoming', description='Test Description', location='Test Location',
+            start_date=now + timedelta(days=3), end_date=now + timedelta(days=3, hours=2),
+            organizer=cls.organizer, capacity=10, price=15
+        )
+        cls.past = Event.objects.create(
+            title='Past', description='Test Description', location='Test Location',
+            start_date=now - timedelta(days=3), end_date=now - timedelta(days=3, hours=-2),
+            organizer=cls.organizer, capacity=10, price=5
+        )
+
+    def test_counters_follow_writes(self):
+        stats = get_platform_stats()
+        self.assertEqual((stats['users_total'], stats['users_type_1'], stats['users_type_2']), (3, 1, 1))
+        self.assertEqual((stats['events_total'], stats['upcoming_events'], stats['past_events']), (2, 1, 1))
+
+        Ticket.objects.purchase(self.upcoming, self.attendee, 3)
+        Ticket.objects.create(event=self.past, attendee=self.attendee)
+        Ticket.objects.filter(pk=Ticket.objects.filter(event=self.upcoming).first().pk).deactivate()
+        stats = get_platform_stats()
+        self.assertEqual((stats['tickets_sold'], stats['revenue']), (3, 35))
+        today = get_daily_stats(days=1)[0]
+        self.assertEqual((today['tickets_sold'], today['revenue']), (4, 50))
+
+        self.upcoming.is_active = False
+        self.upcoming.save()
+        self.attendee.user_type = 2
+        self.attendee.save()
+        stats = get_platform_stats()
+        self.assertEqual((stats['events_active'], stats['upcoming_events']), (1, 0))
+        self.assertEqual((stats['users_type_1'], stats['users_type_2']), (0, 2))
+
+        self.past.delete()
+        stats = get_platform_stats()
+        for key, value in compute_counters().items():
+            self.assertEqual(stats[key], value, key)
+
+    def test_reconcile_command_fixes_drift(self):
+        Ticket.objects.purchase(self.upcoming, self.attendee, 2)
+        PlatformCounter.objects.filter(key='tickets_sold').delete()
+        out = StringIO()
+        call_command('reconcile_stats', stdout=out)
+        self.assertIn('tickets_sold: stored=0, actual=2', out.getvalue())
+        stats = get_platform_stats()
+        self.assertEqual((stats['tickets_sold'], stats['revenue'], stats['upcoming_events']), (2, 30, 1))
+        self.assertEqual(get_daily_stats(days=1)[0]['events_created'], 2)
+
+    def test_price_edits_do_not_drift(self):
+        Ticket.objects.purchase(self.upcoming, self.attendee, 2)
+        self.upcoming.price = 40
+        self.upcoming.save()
+        Ticket.objects.create(event=self.upcoming, attendee=self.attendee)
+        self.assertEqual(reconcile(dry_run=True), {})
+        self.assertEqual(get_platform_stats()['revenue'], 70)
+        Ticket.objects.filter(event=self.upcoming, price=15).deactivate()
+        self.upcoming.delete()
+        self.assertEqual(reconcile(dry_run=True), {})
+        self.assertEqual(get_platform_stats()['revenue'], 0)
+
+    def test_admin_dashboards_do_not_count_rows(self):
+        self.client.login(username='admin', password='testpass123')
+        for name in ('admin_dashboard', 'admin_event_management', 'admin_user_management'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            counts = [q['sql'] for q in queries if 'COUNT(' in q['sql'] and 'events_notification' not in q['sql']]
+            self.assertFalse(counts)
+        self.assertEqual(response.context['organizer_count'], 1)
+        self.assertEqual(response.context['recent_users'], 3)
+
+
+class AttendeeExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.other = User.objects.create_user(username='other', password='testpass123', user_type=2)
+        now = timezone.now()
+        cls.events = [
+            Event.objects.create(
+                title=f'Event {i}', description='Test Description', location='Test Location',
+                start_date=now + timedelta(days=1), end_date=now + timedelta(days=1, hours=2),
+                organizer=cls.organizer, capacity=100, price=10
+            )
+            for i in range(2)
+        ]
+        cls.attendees = [
+            User.objects.create_user(username=f'attendee{i}', email=f'a{i}@example.com', password='testpass123')
+            for i in range(3)
+        ]
+        for event in cls.events:
+            for attendee in cls.attendees:
+                Ticket.objects.purchase(event, attendee, 1)
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_event_csv_export(self):
+        self.client.login(username='organizer', password='testpass123')
+        with self.assertNumQueries(4):
+            # session, user, event, then one joined ticket query while streaming
+            response = self.client.get(reverse('event_export', args=[self.events[0].pk]))
+            rows = list(csv.DictReader(StringIO(self.content(response))))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual([row['attendee_email'] for row in rows], ['a0@example.com', 'a1@example.com', 'a2@example.com'])
+        self.assertEqual(rows[0]['event_title'], 'Event 0')
+
+    def test_all_events_jsonl_export(self):
+        self.client.login(username='organizer', password='testpass123')
+        response = self.client.get(reverse('my_events_export'), {'format': 'jsonl'})
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[-1]['attendee_username'], 'attendee2')
+        self.assertEqual(rows[-1]['price'], '10.00')
+
+    def test_formulas_are_quoted(self):
+        User.objects.filter(pk=self.attendees[0].pk).update(
+            username='=HYPERLINK("x")', first_name='@SUM(A1)', last_name='\t=1+2'
+        )
+        User.objects.filter(pk=self.attendees[1].pk).update(username='+1', first_name='-1', last_name='\r=1')
+        self.client.login(username='organizer', password='testpass123')
+        response = self.client.get(reverse('event_export', args=[self.events[0].pk]))
+        rows = list(csv.DictReader(StringIO(self.content(response), newline='')))
+        self.assertEqual(
+            [(row['attendee_username'], row['attendee_first_name'], row['attendee_last_name']) for row in rows[:2]],
+            [('\'=HYPERLINK("x")', "'@SUM(A1)", "'\t=1+2"), ("'+1", "'-1", "'\r=1")]
+        )
+        row = rows[0]
+        self.assertEqual(row['price'], '10.00')
+
+    async def test_asgi_export_streams(self):
+        await self.async_client.aforce_login(self.organizer)
+        response = await self.async_client.get(reverse('my_events_export'))
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(content.splitlines()), 7)
+
+    def test_export_requires_organizer(self):
+        self.client.login(username='other', password='testpass123')
+        response = self.client.get(reverse('event_export', args=[self.events[0].pk]))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('my_events_export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ImportEventsCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        EventCategory.objects.create(name='Music')
+
+    def write(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def csv_file(self, count, extra=''):
+        start = (timezone.now() + timedelta(days=10)).strftime('%Y-%m-%d %H:%M')
+        end = (timezone.now() + timedelta(days=10, hours=2)).strftime('%Y-%m-%d %H:%M')
+        rows = ['title,description,location,start_date,end_date,category,capacity,price']
+        rows += [
+            f'Imported {i},{"A long enough description for the event form. " * 2},Hall,{start},{end},music,50,9.50'
+            for i in range(count)
+        ]
+        return self.write('.csv', '\n'.join(rows) + '\n' + extra)
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_events', path, '--organizer', 'organizer', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_validates_rows(self):
+        past = (timezone.now() - timedelta(days=1)).strftime('%Y-%m-%d %H:%M')
+        bad = (
+            f'Too short,Short,Hall,{past},{past},,10,0\n'
+            f'Bad category,{"x" * 60},Hall,2099-01-01 10:00,2099-01-01 12:00,Theatre,10,0\n'
+        )
+        path = self.csv_file(5, bad)
+        with CaptureQueriesContext(connection) as queries:
+            out, err = self.run_import(path, '--batch-size', '3')
+        # Lookups come from the preloaded maps, not one query per row.
+        self.assertEqual(len([q for q in queries if 'events_eventcategory' in q['sql']]), 1)
+        self.assertEqual(Event.objects.filter(title__startswith='Imported', category__name='Music').count(), 5)
+        self.assertIn('Imported 5 event(s), rejected 2 row(s)', out)
+        self.assertIn('Row 6: End date must be after start date.', err)
+        self.assertIn("Row 7: category: Unknown category 'Theatre'.", err)
+        self.assertEqual(get_platform_stats()['events_total'], 5)
+        results = get_search_backend().search(Event.objects.all(), 'imported')
+        self.assertEqual(results.count(), 5)
+
+    def test_import_resumes_from_checkpoint(self):
+        path = self.csv_file(6)
+        self.run_import(path, '--batch-size', '2')
+        Event.objects.all().delete()
+        job = Job.objects.get(kind='event_import')
+        # Pretend the first run crashed after its second batch.
+        Job.objects.filter(pk=job.pk).update(
+            status='running', progress=4, checkpoint={'row': 4, 'created': 4, 'rejected': 0}
+        )
+        out, _ = self.run_import(path, '--batch-size', '2')
+        self.assertIn('Resuming job', out)
+        self.assertEqual(sorted(Event.objects.values_list('title', flat=True)), ['Imported 4', 'Imported 5'])
+        out, _ = self.run_import(path)
+        self.assertIn('already imported', out)
+
+    def test_running_import_is_not_claimed(self):
+        path = self.csv_file(4)
+        flush = EventImporter.flush
+        claims = []
+
+        def slow_flush(importer, events, row_number):
+            # The import has been running for an hour by the time each batch
+            # is stored.
+            Job.objects.filter(pk=importer.job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+            flush(importer, events, row_number)
+            claims.append((requeue_stale_jobs(timedelta(seconds=600)), claim_next_job()))
+
+        with mock.patch.object(EventImporter, 'flush', autospec=True, side_effect=slow_flush):
+            self.run_import(path, '--batch-size', '2')
+        self.assertEqual(claims, [(0, None), (0, None)])
+        job = Job.objects.get(kind='event_import')
+        self.assertEqual((job.status, job.attempts), ('done', 1))
+
+    def test_jsonl_import(self):
+        start = (timezone.now() + timedelta(days=3)).isoformat()
+        end = (timezone.now() + timedelta(days=3, hours=1)).isoformat()
+        row = {
+            'title': 'From feed', 'description': 'd' * 60, 'location': 'Online',
+            'start_date': start, 'end_date': end, 'capacity': 20, 'event_type': 'private',
+        }
+        path = self.write('.jsonl', json.dumps(row) + '\n{not json\n')
+        out, err = self.run_import(path)
+        event = Event.objects.get(title='From feed')
+        self.assertEqual((event.organizer, event.event_type, event.price), (self.organizer, 'private', 0))
+        self.assertIn('Row 2:', err)
+
+
+HOT_TABLES = {'events_event', 'events_ticket', 'events_notification', 'events_eventcomment'}
+
+
+def full_table_scans(sql):
+    # Hot tables the database would read in full to run ``sql``. Postgres is
+    # told to avoid sequential scans, which it otherwise picks for tiny test
+    # tables even when a usable index exists.
+    aliases = dict((alias, table) for table, alias in re.findall(r'"(\w+)" (U\d+|T\d+)', sql))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            scans = re.findall(r'Seq Scan on (\w+)', '\n'.join(row[0] for row in cursor.fetchall()))
+        else:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            scans = [
+                match.group(1) for match in (re.fullmatch(r'SCAN (\w+)', row[-1]) for row in cursor.fetchall())
+                if match
+            ]
+    return sorted({aliases.get(name, name) for name in scans} & HOT_TABLES)
+
+
+class QueryPlanTest(TestCase):
+    # Requests every route in events/urls.py as an anonymous user, an
+    # attendee and a superuser organizer, and EXPLAINs each SELECT it ran.
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='testpass123', user_type=3)
+        cls.attendee = User.objects.create_user(username='attendee', password='testpass123', user_type=1)
+        now = timezone.now()
+        cls.events = [
+            Event.objects.create(
+                title=f'Event {i}', description='Test Description', location='Test Location',
+                start_date=now + timedelta(days=i - 5), end_date=now + timedelta(days=i - 5, hours=2),
+                organizer=cls.admin, capacity=10, price=5, event_type='public' if i % 2 else 'private'
+            )
+            for i in range(10)
+        ]
+        for event in cls.events:
+            Ticket.objects.purchase(event, cls.attendee, 1)
+            EventComment.objects.create(event=event, user=cls.attendee, content='Nice', rating=2)
+        cls.comment = EventComment.objects.first()
+        cls.notification = Notification.objects.create(
+            user=cls.attendee, notification_type='ticket_purchase', message='Hi'
+        )
+
+    def url_kwargs(self, pattern):
+        route = str(pattern.pattern)
+        if '<uidb64>' in route:
+            return None
+        if '<str:digest>' in route:
+            return {'digest': '0' * 64, 'width': DERIVATIVE_WIDTHS[0]}
+        if '<int:pk>' not in route:
+            return {}
+        if route.startswith('comments/'):
+            return {'pk': self.comment.pk}
+        if route.startswith('notifications/'):
+            return {'pk': self.notification.pk}
+        return {'pk': self.events[7].pk}
+
+    def test_views_do_not_scan_hot_tables(self):
+        problems = []
+        for username in (None, 'attendee', 'admin'):
+            client = Client()
+            if username:
+                client.login(username=username, password='testpass123')
+            for pattern in urlpatterns:
+                kwargs = self.url_kwargs(pattern)
+                if kwargs is None:
+                    continue
+                url = reverse(pattern.name, kwargs=kwargs)
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url)
+                for query in queries:
+                    if not query['sql'].startswith('SELECT'):
+                        continue
+                    tables = full_table_scans(query['sql'])
+                    if tables:
+                        problems.append(f"{url} as {username or 'anonymous'}: {', '.join(tables)}\n    {query['sql']}")
+        self.assertFalse(problems, '\n'.join(problems))
+
+
+class QueryBudgetMixin:
+    # Maps URL names to the most queries one GET of that view may run. Counts
+    # come from QueryInstrumentationMiddleware via response.query_stats.
+    query_budgets = {}
+
+    def assertQueryBudget(self, response, budget=None, allow_repeats=False):
+        stats = response.query_stats
+        name = response.resolver_match.url_name
+        budget = self.query_budgets[name] if budget is None else budget
+        self.assertLessEqual(stats.count, budget, f"{name} ran {stats.count} queries; its budget is {budget}.")
+        if not allow_repeats:
+            repeated = '\n'.join(f"x{count} {sql}" for sql, count in stats.duplicates().items())
+            self.assertFalse(repeated, f"{name} repeated query shapes (N+1?):\n{repeated}")
+
+
+class ViewQueryBudgetTest(QueryBudgetMixin, TestCase):
+    # Signed-in views also pay for the session, the user and (on a cache
+    # miss) the unread notification count.
+    query_budgets = {
+        'home': 2,
+        'event_list': 4,
+        'event_detail': 5,
+        'user_tickets': 4,
+        'my_events': 5,
+        'user_dashboard': 5,
+        'admin_dashboard': 7,
+        'admin_event_management': 7,
+        'admin_user_management': 7,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='testpass123', user_type=3)
+        categories = [EventCategory.objects.create(name=f'Category {i}') for i in range(3)]
+        attendees = [User.objects.create_user(username=f'attendee{i}', password='testpass123') for i in range(4)]
+        now = timezone.now()
+        cls.events = [
+            Event.objects.create(
+                title=f'Event {i}', description='Test Description', location='Test Location',
+                start_date=now + timedelta(days=i + 1), end_date=now + timedelta(days=i + 1, hours=2),
+                organizer=cls.admin, category=categories[i % 3], capacity=10, price=5
+            )
+            for i in range(12)
+        ]
+        for event in cls.events:
+            for attendee in attendees:
+                Ticket.objects.purchase(event, attendee, 1)
+                EventComment.objects.create(event=event, user=attendee, content='Nice', rating=4)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_public_views(self):
+        for name, args in (('home', []), ('event_list', []), ('event_detail', [self.events[0].pk])):
+            response = self.client.get(reverse(name, args=args))
+            self.assertQueryBudget(response)
+
+    def test_signed_in_views(self):
+        for username, names in (('attendee0', ['user_tickets', 'user_dashboard', 'event_list']),
+                                ('admin', ['my_events', 'user_dashboard', 'admin_dashboard',
+                                           'admin_event_management', 'admin_user_management'])):
+            self.client.login(username=username, password='testpass123')
+            for name in names:
+                response = self.client.get(reverse(name))
+                self.assertQueryBudget(response)
+        response = self.client.get(reverse('event_detail', args=[self.events[0].pk]))
+        self.assertQueryBudget(response)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('event_list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", dup;desc="0 repeated shapes"')
+
+    @override_settings(QUERY_DUPLICATE_WARNING_THRESHOLD=3)
+    def test_repeated_queries_are_logged(self):
+        def view(request):
+            for event in self.events[:3]:
+                Event.objects.get(pk=event.pk)
+            return HttpResponse()
+
+        with self.assertLogs('events.middleware', 'WARNING') as logs:
+            response = QueryInstrumentationMiddleware(view)(RequestFactory().get('/events/'))
+        self.assertEqual(response.query_stats.count, 3)
+        self.assertIn('3 queries', logs.output[0])
+        self.assertIn('worst x3', logs.output[0])
+
+
+class AsyncViewsTest(TestCase):
+    # Through the ASGI handler: async views render on the event loop, where
+    # any query left for the template would raise SynchronousOnlyOperation.
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.attendee = User.objects.create_user(username='attendee', password='testpass123')
+        category = EventCategory.objects.create(name='Music')
+        now = timezone.now()
+        cls.events = [
+            Event.objects.create(
+                title=f'Event {i}', description='Test Description', location='Test Location',
+                start_date=now + timedelta(days=2 * i - 1), end_date=now + timedelta(days=2 * i - 1, hours=2),
+                organizer=cls.organizer, category=category, capacity=10, price=5,
+                event_type='private' if i == 3 else 'public'
+            )
+            for i in range(4)
+        ]
+        for event in cls.events[:3]:
+            Ticket.objects.purchase(event, cls.attendee, 1)
+            EventComment.objects.create(event=event, user=cls.attendee, content='Nice', rating=4)
+        Notification.objects.create(user=cls.attendee, notification_type='new_event', message='New event')
+
+    async def test_public_views(self):
+        response = await self.async_client.get(reverse('home'))
+        self.assertContains(response, 'Event 1')
+        response = await self.async_client.get(reverse('event_list'))
+        self.assertContains(response, 'Event 2')
+        self.assertNotContains(response, 'Event 3')
+        response = await self.async_client.get(reverse('event_list'), {'search': 'event', 'page': 1})
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(reverse('event_detail', args=[self.events[1].pk]))
+        self.assertContains(response, 'Nice')
+        response = await self.async_client.get(reverse('event_detail', args=[self.events[3].pk]))
+        self.assertTrue(response.context['access_denied'])
+        response = await self.async_client.get(reverse('event_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_signed_in_views(self):
+        await self.async_client.aforce_login(self.attendee)
+        response = await self.async_client.get(reverse('user_dashboard'))
+        self.assertEqual([event.title for event in response.context['upcoming_events']], ['Event 1', 'Event 2'])
+        self.assertEqual([event.title for event in response.context['past_events']], ['Event 0'])
+        self.assertEqual(response.context['unread_notifications_count'], 1)
+        response = await self.async_client.get(reverse('user_tickets'))
+        self.assertEqual(len(response.context['tickets']), 3)
+        response = await self.async_client.get(reverse('event_detail', args=[self.events[3].pk]))
+        self.assertFalse(response.context['has_ticket'])
+        self.assertContains(response, 'Event 3')
+
+        await self.async_client.aforce_login(self.organizer)
+        response = await self.async_client.get(reverse('user_dashboard'))
+        self.assertEqual(len(response.context['organized_events']), 4)
+
+    async def test_login_required(self):
+        for name in ('user_dashboard', 'user_tickets'):
+            response = await self.async_client.get(reverse(name))
+            self.assertRedirects(response, f"{settings.LOGIN_URL}?next={reverse(name)}", fetch_redirect_response=False)
+
+    async def test_post_comment(self):
+        url = reverse('event_detail', args=[self.events[2].pk])
+        response = await self.async_client.post(url, {'content': 'Async comment', 'rating': 5})
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+
+        await self.async_client.aforce_login(self.attendee)
+        response = await self.async_client.post(url, {'content': 'Async comment', 'rating': 5})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertTrue(await EventComment.objects.filter(event=self.events[2], content='Async comment').aexists())
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.attendee = User.objects.create_user(username='attendee', password='testpass123')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Concert', description='Live', location='Hall',
+            start_date=now + timedelta(days=1), end_date=now + timedelta(days=1, hours=2),
+            organizer=cls.organizer, capacity=10, price=5
+        )
+        EventComment.objects.create(event=cls.event, user=cls.attendee, content='Nice', rating=4)
+
+    def assertRevalidates(self, url, status=304):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=self.client.get(url)['ETag'])
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_unchanged_detail_is_not_rendered(self):
+        url = reverse('event_detail', args=[self.event.pk])
+        response = self.client.get(url)
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        with CaptureQueriesContext(connection) as queries:
+            revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(revalidated.templates)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_changes(self):
+        url = reverse('event_detail', args=[self.event.pk])
+        etag = self.client.get(url)['ETag']
+        for change in (
+            lambda: EventComment.objects.create(event=self.event, user=self.attendee, content='Again'),
+            lambda: EventComment.objects.filter(event=self.event).delete(),
+            lambda: Ticket.objects.purchase(self.event, self.attendee, 1),
+            lambda: Ticket.objects.filter(event=self.event).deactivate(),
+        ):
+            time.sleep(0.001)
+            change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+
+    def test_signed_in_pages_vary_by_user(self):
+        url = reverse('event_detail', args=[self.event.pk])
+        anonymous = self.client.get(url)
+        self.client.force_login(self.attendee)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous['ETag'], HTTP_IF_MODIFIED_SINCE=anonymous['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('Last-Modified', response)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.attendee, notification_type='new_event', message='New event')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertRevalidates(url)
+
+    def test_pending_messages_are_rendered(self):
+        url = reverse('event_detail', args=[self.event.pk])
+        self.client.force_login(self.attendee)
+        etag = self.client.get(url)['ETag']
+        self.client.post(url, {'content': ''})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'There was an error posting your comment.')
+        self.assertNotIn('ETag', response)
+
+    def test_listings(self):
+        for url in (reverse('home'), reverse('event_list')):
+            self.assertRevalidates(url)
+
+        list_etag = self.client.get(reverse('event_list'))['ETag']
+        time.sleep(0.001)
+        Ticket.objects.purchase(self.event, self.attendee, 1)
+        self.assertEqual(self.client.get(reverse('event_list'), HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        # Ticket sales do not show on the home page.
+        self.assertRevalidates(reverse('home'))
+
+        home_etag = self.client.get(reverse('home'))['ETag']
+        self.event.title = 'Renamed'
+        self.event.save()
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=home_etag)
+        self.assertContains(response, 'Renamed')
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.users = [User.objects.create_user(username=f'user{i}', password='testpass123') for i in range(5)]
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Concert', description='Live', location='Hall',
+            start_date=now + timedelta(days=1), end_date=now + timedelta(days=1, hours=2),
+            organizer=cls.organizer, capacity=10, price=5
+        )
+        cls.comments = [
+            EventComment.objects.create(event=cls.event, user=cls.users[i % 5], content=f'Comment {i}', rating=i % 5 or None)
+            for i in range(25)
+        ]
+
+    def test_counters_follow_comments(self):
+        self.event.refresh_from_db()
+        ratings = [comment.rating for comment in self.comments if comment.rating]
+        self.assertEqual((self.event.comment_count, self.event.rating_count, self.event.rating_sum), (25, 20, sum(ratings)))
+        self.assertEqual(self.event.average_rating, sum(ratings) / 20)
+
+        comment = EventComment.objects.get(pk=self.comments[1].pk)
+        comment.rating = 5
+        comment.save()
+        comment = EventComment.objects.get(pk=self.comments[0].pk)
+        comment.rating = 3
+        comment.save()
+        EventComment.objects.get(pk=self.comments[2].pk).delete()
+        # A stale instance must not write its counters back.
+        self.event.title = 'Renamed'
+        self.event.save()
+
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.comment_count, self.event.rating_count, self.event.rating_sum),
+                         (24, 20, sum(ratings) + 4 + 3 - 2))
+
+        # Events whose counters are right keep their changed_at.
+        changed_at = self.event.changed_at
+        self.assertEqual(Event.objects.recount_comments(), 0)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.changed_at, changed_at)
+
+        Event.objects.filter(pk=self.event.pk).update(comment_count=0, rating_count=0, rating_sum=0)
+        out = StringIO()
+        call_command('recount_comments', stdout=out)
+        self.assertIn('on 1 event(s)', out.getvalue())
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.comment_count, self.event.rating_count, self.event.rating_sum),
+                         (24, 20, sum(ratings) + 4 + 3 - 2))
+        self.assertGreater(self.event.changed_at, changed_at)
+
+    def test_comments_load_a_page_at_a_time(self):
+        response = self.client.get(reverse('event_detail', args=[self.event.pk]))
+        page = response.context['comments']
+        self.assertEqual([comment.content for comment in page], [f'Comment {i}' for i in range(24, 14, -1)])
+        self.assertContains(response, 'Comments (25)')
+        self.assertContains(response, f"{reverse('event_comments', args=[self.event.pk])}?cursor=")
+
+        seen = list(page)
+        cursor = page.next_cursor
+        while cursor:
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('event_comments', args=[self.event.pk]), {'cursor': cursor})
+            page = response.context['comments']
+            seen.extend(page)
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.comments[::-1])
+        self.assertNotContains(response, 'Load more comments')
+
+        response = self.client.get(reverse('event_comments', args=[self.event.pk]), {'cursor': 'bad'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_private_comments_need_sign_in(self):
+        Event.objects.filter(pk=self.event.pk).update(event_type='private')
+        url = reverse('event_comments', args=[self.event.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.users[0])
+        self.assertContains(self.client.get(url), 'Comment 24')
+
+    def test_list_cards_show_average_rating(self):
+        self.event.refresh_from_db()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('event_list'))
+        self.assertContains(response, f'{self.event.average_rating:.1f} <small class="text-muted">(20)</small>')
+
+
+class EventPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.attendee = User.objects.create_user(username='attendee', password='testpass123')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Concert', description='Live', location='Hall',
+            start_date=now + timedelta(days=1), end_date=now + timedelta(days=1, hours=2),
+            organizer=cls.organizer, capacity=10, price=5
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('event_detail', args=[self.event.pk])
+
+    def test_anonymous_pages_are_cached(self):
+        first = self.client.get(self.url)
+        self.assertTrue(first.templates)
+        with self.assertNumQueries(1):
+            second = self.client.get(self.url)
+        self.assertFalse(second.templates)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_writes_rebuild_the_page(self):
+        def rename():
+            event = Event.objects.get(pk=self.event.pk)
+            event.title = 'Renamed'
+            event.save()
+
+        self.client.get(self.url)
+        for change, text in (
+            (lambda: EventComment.objects.create(event=self.event, user=self.attendee, content='Fresh comment'), 'Fresh comment'),
+            (lambda: Ticket.objects.purchase(self.event, self.attendee, 3), '7 of 10'),
+            (rename, 'Renamed'),
+        ):
+            time.sleep(0.001)
+            change()
+            self.assertContains(self.client.get(self.url), text)
+
+    def test_personal_pages_are_not_cached(self):
+        self.client.get(self.url)
+        self.client.force_login(self.attendee)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Purchase Ticket')
+
+        self.client.logout()
+        Event.objects.filter(pk=self.event.pk).update(event_type='private', changed_at=timezone.now())
+        for _ in range(2):
+            self.assertTrue(self.client.get(self.url).context['access_denied'])
+
+    async def test_rebuilds_are_single_flight(self):
+        builds = []
+
+        async def build():
+            builds.append(1)
+            await asyncio.sleep(0.05)
+            return b'page'
+
+        results = await asyncio.gather(*[cached_page('test', 1, build) for _ in range(20)])
+        self.assertEqual(results, [b'page'] * 20)
+        self.assertEqual(len(builds), 1)
+
+        # Another process holds the lock: an expired entry of the same
+        # version is served meanwhile...
+        entry = await cache.aget(page_cache.page_key('test'))
+        entry['expires'] = 0
+        await cache.aset(page_cache.page_key('test'), entry)
+        await cache.aadd(page_cache.lock_key('test', 1), True)
+        self.assertEqual(await cached_page('test', 1, build), b'page')
+        self.assertEqual(len(builds), 1)
+
+        # ...but an older version never is.
+        await cache.aadd(page_cache.lock_key('test', 2), True)
+        self.assertEqual(await cached_page('test', 2, build), b'page')
+        self.assertEqual(len(builds), 2)
+
+    async def test_early_refresh(self):
+        builds = []
+
+        async def build():
+            builds.append(1)
+            return b'page'
+
+        await cached_page('test', 1, build)
+        entry = await cache.aget(page_cache.page_key('test'))
+        self.assertFalse(page_cache.needs_refresh(entry, time.time()))
+        self.assertTrue(page_cache.needs_refresh(entry, entry['expires']))
+        entry['delta'] = 1
+        with mock.patch('random.random', return_value=0.999):
+            self.assertTrue(page_cache.needs_refresh(entry, entry['expires'] - 5))
+
+        entry['expires'] = time.time()
+        await cache.aset(page_cache.page_key('test'), entry)
+        self.assertEqual(await cached_page('test', 1, build), b'page')
+        self.assertEqual(len(builds), 2)
+
+
+class EventCardCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.attendee = User.objects.create_user(username='attendee', password='testpass123')
+        category = EventCategory.objects.create(name='Music')
+        now = timezone.now()
+        cls.events = [
+            Event.objects.create(
+                title=f'Event {i}', description='Live', location='Hall',
+                start_date=now + timedelta(days=i + 1), end_date=now + timedelta(days=i + 1, hours=2),
+                organizer=cls.organizer, category=category, capacity=10, price=5
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cards_are_cached_per_page(self):
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            response = self.client.get(reverse('event_list'))
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(len(get_many.call_args.args[0]), 3)
+        self.assertIn('events/cards/list.html', [t.name for t in response.templates])
+        self.assertEqual(get_card_cache_stats(), {'hits': 0, 'misses': 3, 'hit_rate': 0})
+
+        response = self.client.get(reverse('event_list'))
+        self.assertNotIn('events/cards/list.html', [t.name for t in response.templates])
+        self.assertContains(response, '10 tickets left', count=3)
+        self.assertEqual(get_card_cache_stats(), {'hits': 3, 'misses': 3, 'hit_rate': 0.5})
+
+    def test_changes_replace_the_card(self):
+        self.client.get(reverse('event_list'))
+        Ticket.objects.purchase(self.events[0], self.attendee, 2)
+        EventComment.objects.create(event=self.events[1], user=self.attendee, content='Great', rating=4)
+        event = Event.objects.get(pk=self.events[2].pk)
+        event.title = 'Renamed'
+        event.save()
+
+        response = self.client.get(reverse('event_list'))
+        self.assertContains(response, '8 tickets left')
+        self.assertContains(response, '4.0 <small class="text-muted">(1)</small>')
+        self.assertContains(response, 'Renamed')
+        self.assertEqual(get_card_cache_stats()['misses'], 6)
+
+    def test_keys_cover_only_what_the_style_shows(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('event_list'))
+        Ticket.objects.purchase(self.events[0], self.attendee, 1)
+        EventComment.objects.create(event=self.events[1], user=self.attendee, content='Great', rating=5)
+
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('events/cards/home.html', [t.name for t in response.templates])
+        self.client.get(reverse('event_list'))
+        self.assertEqual(get_card_cache_stats(), {'hits': 4, 'misses': 8, 'hit_rate': 1 / 3})
+
+    def test_styles_and_annotations_are_kept_apart(self):
+        Ticket.objects.purchase(self.events[0], self.attendee, 2)
+        self.client.force_login(self.attendee)
+        self.assertContains(self.client.get(reverse('user_dashboard')), '2 tickets')
+        self.assertContains(self.client.get(reverse('home')), 'Event 0')
+        Ticket.objects.filter(event=self.events[0], attendee=self.attendee)[:1].get().delete()
+        self.assertContains(self.client.get(reverse('user_dashboard')), '1 ticket\n')
+
+        self.client.force_login(self.organizer)
+        self.assertContains(self.client.get(reverse('my_events')), 'Music • $5')
+
+
+class RecommendationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.users = [User.objects.create_user(username=f'attendee{i}', password='testpass123') for i in range(3)]
+        now = timezone.now()
+        cls.events = [
+            Event.objects.create(
+                title=f'Event {i}', description='Live', location='Hall',
+                start_date=now + timedelta(days=i - 1), end_date=now + timedelta(days=i - 1, hours=2),
+                organizer=organizer, capacity=10, price=5
+            )
+            for i in range(5)
+        ]
+        # Event 0 is over. Attendee 0 went to it and holds Event 1; the
+        # others went along and also hold Events 2-4.
+        holdings = ([0, 1], [0, 1, 2, 3], [0, 2, 4])
+        for user, indexes in zip(cls.users, holdings):
+            for index in indexes:
+                Ticket.objects.create(event=cls.events[index], attendee=user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_item_neighbors(self):
+        # Cosine similarity of the event columns; the repeated cell counts once.
+        triples = [(1, 10, 1), (1, 20, 1), (2, 10, 1), (2, 20, 0.5), (2, 20, 0.5), (2, 30, 1), (3, 30, 1), (3, 40, 1)]
+        users, events, weights = zip(*triples)
+        sources, targets, scores = item_neighbors(users, events, weights, top_k=1)
+        self.assertEqual(list(zip(sources, targets)), [(10, 20), (20, 10), (30, 40), (40, 30)])
+        self.assertAlmostEqual(scores[0], 1.0)
+        self.assertAlmostEqual(scores[2], 0.5 ** 0.5)
+
+        with mock.patch.object(recommendations, 'PAIR_BATCH', 1):
+            batched = item_neighbors(users, events, weights, top_k=3, candidates=[30, 40])
+        self.assertEqual(list(zip(*batched[:2])), [(10, 30), (20, 30), (30, 40), (40, 30)])
+        self.assertAlmostEqual(batched[2][0], 0.5)
+
+    def test_command_and_recommendations(self):
+        out = StringIO()
+        call_command('build_recommendations', top_k=5, stdout=out)
+        self.assertIn('event neighbour(s)', out.getvalue())
+        # Only upcoming events are neighbours.
+        self.assertFalse(EventNeighbor.objects.filter(neighbor=self.events[0]).exists())
+        self.assertTrue(EventNeighbor.objects.filter(event=self.events[0]).exists())
+
+        with self.assertNumQueries(1):
+            recommended = list(Event.objects.recommended_for(self.users[0]))
+        self.assertEqual(recommended, [self.events[2], self.events[3], self.events[4]])
+        self.assertGreater(recommended[0].score, recommended[2].score)
+
+        Event.objects.filter(pk=self.events[2].pk).update(is_active=False)
+        Ticket.objects.create(event=self.events[3], attendee=self.users[0])
+        self.assertEqual(list(Event.objects.recommended_for(self.users[0])), [self.events[4]])
+
+    def test_ratings_weight_attendances(self):
+        EventComment.objects.create(event=self.events[3], user=self.users[1], content='Meh', rating=1)
+        EventComment.objects.create(event=self.events[4], user=self.users[0], content='Loved it', rating=5)
+        users, events, weights = recommendations.load_interactions(include_ratings=True)
+        self.assertEqual(len(users), 11)
+        self.assertEqual(sorted(weights[-2:]), [-0.5, 0.5])
+
+        call_command('build_recommendations', ratings=True, stdout=StringIO())
+        # Attendee 0's rating of Event 4 makes it a neighbour of Event 1.
+        self.assertTrue(EventNeighbor.objects.filter(event=self.events[1], neighbor=self.events[4]).exists())
+
+    def test_home_and_dashboard(self):
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertNotContains(self.client.get(reverse('home')), 'Recommended for You')
+
+        self.client.force_login(self.users[0])
+        for name in ('home', 'user_dashboard'):
+            response = self.client.get(reverse(name))
+            self.assertContains(response, 'Recommended for You')
+            self.assertEqual(response.context['recommended_events'][0], self.events[2])
+
+
+class AvailabilityStreamTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+        cls.attendee = User.objects.create_user(username='attendee', password='testpass123')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Concert', description='Live', location='Hall',
+            start_date=now + timedelta(days=1), end_date=now + timedelta(days=1, hours=2),
+            organizer=cls.organizer, capacity=10, price=5
+        )
+
+    async def test_burst_is_coalesced(self):
+        hub = InMemoryBroker(interval=0.05)
+        reads = []
+        state = {'value': 0}
+
+        async def read(key):
+            reads.append(key)
+            return state['value']
+
+        def burst():
+            # Spread over several intervals.
+            for i in range(1, 1001):
+                state['value'] = i
+                hub.publish('event')
+                time.sleep(0.0003)
+
+        pushes = []
+        async with hub.subscribe('event') as first, hub.subscribe('event') as second:
+            async def collect(subscription):
+                async for value in subscription.values(read, keepalive=0.5):
+                    pushes.append(value)
+                    if value == 1000:
+                        return
+
+            collectors = asyncio.gather(collect(first), collect(second))
+            await asyncio.sleep(0.01)
+            started = time.monotonic()
+            await asyncio.to_thread(burst)
+            await asyncio.wait_for(collectors, 5)
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(hub.subscriber_count('event'), 0)
+        # Per subscriber: the initial value plus at most one per interval.
+        self.assertLessEqual(len(pushes), 2 * (2 + elapsed / 0.05 + 1))
+        # Both subscribers share each read.
+        self.assertLessEqual(len(reads), 2 + elapsed / 0.05 + 1)
+
+    async def test_stream_pushes_purchases(self):
+        response = await self.async_client.get(reverse('event_availability', args=[self.event.pk]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = aiter(response.streaming_content)
+        self.assertEqual(await anext(content), b'retry: 3000\n\n')
+        self.assertEqual(
+            await anext(content),
+            b'event: availability\ndata: {"available":10,"capacity":10,"is_active":true}\n\n'
+        )
+        pushed = asyncio.ensure_future(anext(content))
+        while not availability_hub.subscriber_count(self.event.pk):
+            await asyncio.sleep(0.01)
+
+        def purchase():
+            with self.captureOnCommitCallbacks(execute=True):
+                Ticket.objects.purchase(self.event, self.attendee, 3)
+
+        await sync_to_async(purchase)()
+        self.assertIn(b'"available":7', await asyncio.wait_for(pushed, 5))
+        await response.streaming_content.aclose()
+
+    async def test_stream_rereads_on_keepalive(self):
+        # A sale made in another process publishes nothing here.
+        with mock.patch('events.views.KEEPALIVE_INTERVAL', 0.05):
+            response = await self.async_client.get(reverse('event_availability', args=[self.event.pk]))
+            content = aiter(response.streaming_content)
+            await anext(content)
+            await anext(content)
+            self.assertEqual(await asyncio.wait_for(anext(content), 5), b': keepalive\n\n')
+            await Event.objects.filter(pk=self.event.pk).aupdate(tickets_sold=4)
+            while (line := await asyncio.wait_for(anext(content), 5)) == b': keepalive\n\n':
+                pass
+            self.assertIn(b'"available":6', line)
+            await response.streaming_content.aclose()
+
+    def test_wsgi_sends_current_value(self):
+        response = self.client.get(reverse('event_availability', args=[self.event.pk]))
+        self.assertEqual(response.content, (
+            b'retry: 10000\n\nevent: availability\n'
+            b'data: {"available":10,"capacity":10,"is_active":true}\n\n'
+        ))
+
+    def test_private_event(self):
+        Event.objects.filter(pk=self.event.pk).update(event_type='private')
+        url = reverse('event_availability', args=[self.event.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.attendee)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class RecordingBroker(InMemoryBroker):
+    def __init__(self):
+        super().__init__()
+        self.published = []
+
+    def publish(self, key):
+        self.published.append(key)
+        super().publish(key)
+
+
+class NotificationStreamTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='attendee', password='testpass123')
+        cls.other = User.objects.create_user(username='other', password='testpass123')
+        cls.notifications = [
+            Notification.objects.create(user=cls.user, notification_type='new_event', message=f'Old {i}')
+            for i in range(3)
+        ]
+
+    def notify(self, user, message):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(user=user, notification_type='new_event', message=message)
+
+    async def test_stream_delivers_new_notifications(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('notification_stream'))
+        content = aiter(response.streaming_content)
+        self.assertEqual(await anext(content), f'retry: 3000\nid: {self.notifications[-1].pk}\n\n'.encode())
+        pushed = asyncio.ensure_future(anext(content))
+        await asyncio.sleep(0.05)
+
+        await sync_to_async(self.notify)(self.other, 'Not yours')
+        notification = await sync_to_async(self.notify)(self.user, 'Hello')
+        message = (await asyncio.wait_for(pushed, 5)).decode()
+        self.assertTrue(message.startswith(f'id: {notification.pk}\nevent: notification\ndata: '))
+        data = json.loads(message.split('data: ', 1)[1])
+        self.assertEqual((data['message'], data['unread_count']), ('Hello', 4))
+        await response.streaming_content.aclose()
+
+    async def test_resume_from_last_event_id(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse('notification_stream'), headers={'Last-Event-ID': str(self.notifications[0].pk)}
+        )
+        content = aiter(response.streaming_content)
+        await anext(content)
+        self.assertIn(b'Old 1', await anext(content))
+        self.assertIn(b'Old 2', await anext(content))
+        await response.streaming_content.aclose()
+
+    def test_wsgi_sends_backlog(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notification_stream'), {'after': self.notifications[1].pk})
+        body = response.content.decode()
+        self.assertTrue(body.startswith(f'retry: 10000\nid: {self.notifications[2].pk}\n\n'))
+        self.assertIn('Old 2', body)
+        self.assertNotIn('Old 1', body)
+
+        self.client.force_login(self.other)
+        response = self.client.get(reverse('notification_stream'))
+        self.assertEqual(response.content, b'retry: 10000\nid: 0\n\n')
+
+    def test_anonymous(self):
+        self.assertEqual(self.client.get(reverse('notification_stream')).status_code, 403)
+
+    @override_settings(NOTIFICATION_BROKER='events.tests.RecordingBroker')
+    def test_fan_out_is_announced(self):
+        event = Event.objects.create(
+            title='Cancelled', description='Test', location='Hall',
+            start_date=timezone.now() + timedelta(days=1), end_date=timezone.now() + timedelta(days=2),
+            organizer=self.other, capacity=10
+        )
+        Ticket.objects.purchase(event, self.user, 1)
+        enqueue('event_cancellation', event_id=event.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending_jobs()
+        self.assertCountEqual(get_notification_broker().published, [self.user.pk, self.other.pk])
+
+
+class CrossProcessNotificationTest(TransactionTestCase):
+    # run_jobs is its own process: the unread count it invalidates and the
+    # announcement it publishes must reach the web process.
+    def run_jobs(self):
+        env = {
+            **os.environ,
+            'DATABASE_NAME': str(connection.settings_dict['NAME']),
+            'CACHE_LOCATION': str(settings.CACHES['default']['LOCATION']),
+        }
+        subprocess.run(
+            [sys.executable, 'manage.py', 'run_jobs', '--burst'],
+            cwd=settings.BASE_DIR, env=env, check=True, capture_output=True
+        )
+
+    async def test_fan_out_from_run_jobs(self):
+        user = await User.objects.acreate(username='attendee')
+        organizer = await User.objects.acreate(username='organizer')
+        event = await Event.objects.acreate(
+            title='Cancelled', description='Test', location='Hall',
+            start_date=timezone.now() + timedelta(days=1), end_date=timezone.now() + timedelta(days=2),
+            organizer=organizer, capacity=10
+        )
+        await Ticket.objects.acreate(event=event, attendee=user)
+        self.assertEqual(await sync_to_async(get_unread_count)(user), 0)
+
+        async with get_notification_broker().subscribe(user.pk) as subscription:
+            await sync_to_async(enqueue)('event_cancellation', event_id=event.pk)
+            await sync_to_async(self.run_jobs)()
+            self.assertTrue(await subscription.wait(5))
+        self.assertEqual(await sync_to_async(get_unread_count)(user), 1)
+
+
+def jpeg_bytes(size=(1200, 800), orientation=None):
+    image = Image.new('RGB', size, (200, 40, 40))
+    exif = Image.Exif()
+    exif[0x010f] = 'Test Camera'
+    if orientation:
+        exif[0x0112] = orientation
+    output = BytesIO()
+    image.save(output, 'JPEG', exif=exif.tobytes())
+    return output.getvalue()
+
+
+class ImageDerivativeTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.organizer = User.objects.create_user(username='organizer', password='testpass123', user_type=2)
+
+    def create_event(self, data, title='Concert'):
+        now = timezone.now()
+        return Event.objects.create(
+            title=title, description='Live', location='Hall',
+            start_date=now + timedelta(days=1), end_date=now + timedelta(days=1, hours=2),
+            organizer=self.organizer, capacity=10, image=SimpleUploadedFile('banner.jpg', data)
+        )
+
+    def test_uploads_are_hashed(self):
+        data = jpeg_bytes()
+        first, second = self.create_event(data), self.create_event(data, 'Again')
+        self.assertEqual(first.image_hash, hashlib.sha256(data).hexdigest())
+        self.assertEqual(second.image_hash, first.image_hash)
+        self.assertNotEqual(first.image.name, second.image.name)
+
+        first.title = 'Renamed'
+        first.save()
+        self.assertEqual(Event.objects.get(pk=first.pk).image_hash, second.image_hash)
+
+    def test_derivative_is_generated_once(self):
+        event = self.create_event(jpeg_bytes(orientation=6))
+        url = reverse('image_derivative', args=[event.image_hash, 320])
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (320, 480)))
+            self.assertFalse({'exif', 'icc_profile', 'xmp'} & set(image.info))
+
+        path = os.path.join(settings.MEDIA_ROOT, derivative_name(event.image_hash, 320))
+        modified = os.path.getmtime(path)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.assertEqual(os.path.getmtime(path), modified)
+
+    def test_unknown_images(self):
+        event = self.create_event(jpeg_bytes())
+        for args in ([event.image_hash, 321], ['0' * 64, 320], ['not-a-hash', 320]):
+            self.assertEqual(self.client.get(reverse('image_derivative', args=args)).status_code, 404)
+
+    def test_upload_prewarms_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            event = self.create_event(jpeg_bytes())
+        for width in DERIVATIVE_WIDTHS:
+            future = submit_derivative(event.image.name, event.image_hash, width)
+            self.assertTrue(os.path.exists(future.result(5)))
+
+    def test_responsive_image_tag(self):
+        event = self.create_event(jpeg_bytes())
+        html = Template("{% load image_tags %}{% responsive_image event.image 'card' alt=event.title %}").render(
+            Context({'event': event})
+        )
+        for width in IMAGE_PRESETS['card']['widths']:
+            self.assertIn(f"{reverse('image_derivative', args=[event.image_hash, width])} {width}w", html)
+        self.assertIn('loading="lazy"', html)
+
+        Event.objects.filter(pk=event.pk).update(image_hash='')
+        event.refresh_from_db()
+        html = Template("{% load image_tags %}{% responsive_image event.image 'card' %}").render(
+            Context({'event': event})
+        )
+        self.assertIn(f'src="{event.image.url}"', html)
+        self.assertNotIn('srcset', html)
+
+
+class MediaServingTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(media_root, 'event_images'))
+        self.data = bytes(range(256)) * 4
+        with open(os.path.join(media_root, 'event_images', 'poster.jpg'), 'wb') as f:
+            f.write(self.data)
+        self.url = f'{settings.MEDIA_URL}event_images/poster.jpg'
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_range_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        for header, start, end in (('bytes=0-99', 0, 99), ('bytes=1000-', 1000, 1023), ('bytes=-24', 1000, 1023),
+                                   ('bytes=1000-5000', 1000, 1023)):
+            response = self.client.get(self.url, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/1024')
+            self.assertEqual(b''.join(response.streaming_content), self.data[start:end + 1])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+        # A stale If-Range or a multi-range request gets the whole file.
+        for headers in ({'HTTP_IF_RANGE': '"stale"'}, {'HTTP_IF_RANGE': etag, 'HTTP_RANGE': 'bytes=0-1,5-6'}):
+            response = self.client.get(self.url, **{'HTTP_RANGE': 'bytes=0-99', **headers})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    async def test_asgi_streams_asynchronously(self):
+        response = await self.async_client.get(self.url)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Length'], '1024')
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), self.data)
+
+        with mock.patch('events.media.CHUNK_SIZE', 100):
+            response = await self.async_client.get(self.url, headers={'Range': 'bytes=10-309'})
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual([len(chunk) for chunk in chunks], [100, 100, 100])
+        self.assertEqual(b''.join(chunks), self.data[10:310])
+
+    def test_offload_headers(self):
+        with override_settings(MEDIA_OFFLOAD='x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/event_images/poster.jpg')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+        with override_settings(MEDIA_OFFLOAD='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], os.path.join(settings.MEDIA_ROOT, 'event_images', 'poster.jpg'))
+
+    def test_derivatives_are_immutable(self):
+        digest = 'ab' * 32
+        path = os.path.join(settings.MEDIA_ROOT, derivative_name(digest, 320))
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(b'webp')
+        response = self.client.get(f'{settings.MEDIA_URL}{derivative_name(digest, 320)}')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['ETag'], f'"{digest}-320"')
+
+        response = self.client.get(reverse('image_derivative', args=[digest, 320]), HTTP_IF_NONE_MATCH=f'"{digest}-320"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_files(self):
+        for path in ('event_images/missing.jpg', 'event_images', '../settings.py', '%2e%2e/%2e%2e/etc/passwd'):
+            self.assertEqual(self.client.get(f'{settings.MEDIA_URL}{path}').status_code, 404, path)
+
+
+class BenchmarkCommandTest(TestCase):
+    def test_seed_and_benchmark(self):
+        out = StringIO()
+        call_command(
+            'seed_benchmark', '--users', '20', '--organizers', '3', '--categories', '2', '--events', '15',
+            '--tickets', '60', '--comments', '10', '--notifications', '10', stdout=out
+        )
+        self.assertIn('Created 60 tickets', out.getvalue())
+        self.assertEqual(Ticket.objects.count(), 60)
+        self.assertEqual(
+            sum(Event.objects.values_list('tickets_sold', flat=True)),
+            Ticket.objects.filter(is_active=True).count()
+        )
+        self.assertEqual(get_platform_stats()['tickets_sold'], 60)
+
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        call_command(
+            'run_benchmark', '--requests', '3', '--warmup', '0', '--routes', 'home', 'event_detail',
+            '--output', path, stdout=StringIO()
+        )
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(report['data_set']['tickets'], 60)
+        result = report['routes']['attendee event_detail']
+        self.assertEqual(result['statuses'], {'200': 3})
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(result['queries_per_request'], 5)
@@ -0,0 +1,182 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import IntegrityError, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Crockford base32: no I, L, O or U, so numbers are easy to read out loud.
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+# A leased node id is renewed every NODE_LEASE_RENEW_AFTER while numbers are
+# issued, and may be claimed by another process once it has gone unrenewed
+# for NODE_LEASE_TIMEOUT.
+NODE_LEASE_TIMEOUT = timedelta(minutes=10)
+NODE_LEASE_RENEW_AFTER = timedelta(minutes=3)
+
+
+def encode_base32(value, width):
+    chars = []
+    for _ in range(width):
+        value, remainder = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[remainder])
+    if value:
+        raise ValueError(f"Value does not fit in {width} base32 digits.")
+    return ''.join(reversed(chars))
+
+
+def claim_node_id(holder, max_node):
+    TicketNumberNode = apps.get_model('events', 'TicketNumberNode')
+    now = timezone.now()
+    expired = now - NODE_LEASE_TIMEOUT
+    leased = set(TicketNumberNode.objects.filter(renewed_at__gte=expired).values_list('node_id', flat=True))
+    for node_id in range(max_node + 1):
+        if node_id in leased:
+            continue
+        # Both the takeover and the insert succeed for one process only.
+        if TicketNumberNode.objects.filter(node_id=node_id, renewed_at__lt=expired).update(
+            holder=holder, renewed_at=now
+        ):
+            return node_id
+        try:
+            with transaction.atomic():
+                TicketNumberNode.objects.create(node_id=node_id, holder=holder, renewed_at=now)
+        except IntegrityError:
+            continue
+        return node_id
+    raise ImproperlyConfigured(
+        f"All {max_node + 1} ticket number node ids are leased; set TICKET_NUMBER_NODE_ID instead."
+    )
+
+
+def renew_node_id(node_id, holder):
+    TicketNumberNode = apps.get_model('events', 'TicketNumberNode')
+    return TicketNumberNode.objects.filter(node_id=node_id, holder=holder).update(renewed_at=timezone.now()) == 1
+
+
+class TicketNumberGenerator:
+    prefix = 'TK'
+    width = 13
+
+    def next_values(self, count):
+        raise NotImplementedError
+
+    def generate(self, count=1):
+        return [
+            f"{self.prefix}{encode_base32(value, self.width)}"
+            for value in self.next_values(count)
+        ]
+
+
+class SnowflakeGenerator(TicketNumberGenerator):
+    # 41 bits of milliseconds since EPOCH_MS, 10 bits of node id and a 12 bit
+    # per-millisecond sequence: 63 bits, i.e. 13 base32 digits.
+    EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+    NODE_BITS = 10
+    SEQUENCE_BITS = 12
+    MAX_NODE = (1 << NODE_BITS) - 1
+    MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+    def __init__(self, node_id=None):
+        # Two processes with the same node id issue the same numbers, so each
+        # needs its own: given here, set in TICKET_NUMBER_NODE_ID, or else
+        # leased from the database for as long as the process runs.
+        if node_id is None or node_id == '':
+            node_id = getattr(settings, 'TICKET_NUMBER_NODE_ID', None)
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+        self._pid = os.getpid()
+        self.leased = node_id is None or node_id == ''
+        if self.leased:
+            self._claim()
+            return
+        try:
+            self.node_id = int(node_id)
+        except (TypeError, ValueError):
+            self.node_id = -1
+        if not 0 <= self.node_id <= self.MAX_NODE:
+            raise ImproperlyConfigured(f"TICKET_NUMBER_NODE_ID must be between 0 and {self.MAX_NODE}, not {node_id!r}.")
+
+    def _claim(self):
+        self._pid = os.getpid()
+        self.holder = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+        self.node_id = claim_node_id(self.holder, self.MAX_NODE)
+        self._renewed_at = time.monotonic()
+
+    def _check_node(self):
+        if not self.leased:
+            if os.getpid() != self._pid:
+                # A forked worker would share its parent's node id.
+                raise ImproperlyConfigured(
+                    "The ticket number generator was created before the process forked; "
+                    "each worker needs its own TICKET_NUMBER_NODE_ID."
+                )
+            return
+        if os.getpid() != self._pid:
+            # Forked from the process holding the lease.
+            self._claim()
+        elif time.monotonic() - self._renewed_at >= NODE_LEASE_RENEW_AFTER.total_seconds():
+            # Lost if it went unrenewed long enough for another process to
+            # claim it. Renewing well inside the timeout leaves room for a
+            # renewal rolled back with its purchase; should a clash slip
+            # through anyway, the ticket_number unique constraint catches it
+            # and the purchase retries.
+            if renew_node_id(self.node_id, self.holder):
+                self._renewed_at = time.monotonic()
+            else:
+                self._claim()
+
+    def _now_ms(self):
+        return time.time_ns() // 1_000_000 - self.EPOCH_MS
+
+    def next_values(self, count):
+        values = []
+        with self._lock:
+            self._check_node()
+            for _ in range(count):
+                now = self._now_ms()
+                if now < self._last_ms:
+                    # Clock went backwards; keep issuing from the last timestamp.
+                    now = self._last_ms
+                if now == self._last_ms:
+                    self._sequence = (self._sequence + 1) & self.MAX_SEQUENCE
+                    if self._sequence == 0:
+                        while now <= self._last_ms:
+                            now = self._now_ms()
+                else:
+                    self._sequence = 0
+                self._last_ms = now
+                values.append(
+                    (now << (self.NODE_BITS + self.SEQUENCE_BITS))
+                    | (self.node_id << self.SEQUENCE_BITS)
+                    | self._sequence
+                )
+        return values
+
+
+_generator = None
+
+
+def get_ticket_number_generator():
+    global _generator
+    if _generator is None:
+        path = getattr(settings, 'TICKET_NUMBER_GENERATOR', 'events.ticket_numbers.SnowflakeGenerator')
+        _generator = import_string(path)()
+    return _generator
+
+
+@receiver(setting_changed)
+def reset_ticket_number_generator(setting, **kwargs):
+    global _generator
+    if setting in ('TICKET_NUMBER_GENERATOR', 'TICKET_NUMBER_NODE_ID'):
+        _generator = None
@@ -2,8 +2,9 @@ from django.urls import path
 from .views import (
     HomeView, EventListView, EventDetailView, EventCreateView,
     EventUpdateView, EventDeleteView, purchase_ticket, UserDashboardView,
-    CustomLoginView, RegisterView, CustomPasswordResetView, mark_notification_as_read,
-    AdminDashboardView, CustomLogoutView, ProfileUpdateView, 
+    export_event_attendees, export_my_events_attendees, event_availability, event_comments, image_derivative,
+    CustomLoginView, RegisterView, CustomPasswordResetView, mark_notification_as_read, notification_stream,
+    AdminDashboardView, AdminEventManagementView, AdminUserManagementView, CustomLogoutView, ProfileUpdateView, 
     UserTicketsView, CommentUpdateView, CommentDeleteView, MyEventsListView,
     MarkAllNotificationsAsReadView
 )
@@ -27,9 +28,17 @@ urlpatterns = [
     path('events/<int:pk>/update/', EventUpdateView.as_view(), name='event_update'),
     path('events/<int:pk>/delete/', EventDeleteView.as_view(), name='event_delete'),
     path('events/<int:pk>/purchase/', purchase_ticket, name='purchase_ticket'),
+    path('events/<int:pk>/availability/', event_availability, name='event_availability'),
+    path('events/<int:pk>/comments/', event_comments, name='event_comments'),
+    path('images/<str:digest>/<int:width>.webp', image_derivative, name='image_derivative'),
+    path('events/<int:pk>/export/', export_event_attendees, name='event_export'),
+    path('my-events/export/', export_my_events_attendees, name='my_events_export'),
     path('dashboard/', UserDashboardView.as_view(), name='user_dashboard'),
     path('notifications/<int:pk>/mark-read/', mark_notification_as_read, name='mark_notification_read'),
+    path('notifications/stream/', notification_stream, name='notification_stream'),
     path('admin-dashboard/', AdminDashboardView.as_view(), name='admin_dashboard'),
+    path('admin-dashboard/events/', AdminEventManagementView.as_view(), name='admin_event_management'),
+    path('admin-dashboard/users/', AdminUserManagementView.as_view(), name='admin_user_management'),
     path('logout/', CustomLogoutView.as_view(), name='logout'),
     path('profile/update/', ProfileUpdateView.as_view(), name='profile_update'),
     path('tickets/', UserTicketsView.as_view(), name='user_tickets'),
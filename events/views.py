@@ -1,14 +1,38 @@
+import asyncio
+import hashlib
+import logging
+import re
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic import (
     ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView, View
 )
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.contrib.messages.storage.cookie import CookieStorage
 from django.utils import timezone
-from django.db.models import Q
-from .models import Event, EventComment, Ticket, CustomUser, Notification, EventCategory
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied, SuspiciousFileOperation, ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.db import IntegrityError, transaction
+from .models import Event, EventComment, Ticket, CustomUser, Notification, EventCategory, Job
+from .cards import get_card_cache_stats
+from .exports import EXPORT_FORMATS, export_tickets, streaming_export
+from .images import DERIVATIVE_DIR, DERIVATIVE_WIDTHS, derivative_name, get_derivative
+from .media import file_response
+from .live import KEEPALIVE_INTERVAL, availability_hub, get_notification_broker, sse_message
+from .jobs import describe_value, enqueue, enqueue_event_update
+from .notifications import adjust_unread_count, aget_unread_count, invalidate_unread_counts
+from .page_cache import cached_page
+from .pagination import CursorPaginationMixin, CursorPaginator, InvalidCursor
+from .search import get_search_backend
+from .stats import get_daily_stats, get_platform_stats, user_type_key
 from .forms import (
     CustomUserCreationForm, CustomAuthenticationForm, EventForm,
     EventCommentForm, TicketPurchaseForm, CustomPasswordResetForm, ProfileUpdateForm
@@ -19,97 +43,292 @@ from django.contrib.auth.views import (
 
 from asgiref.sync import sync_to_async
 
+logger = logging.getLogger(__name__)
+
+
+async def load_user(request):
+    # request.user loads lazily and synchronously, which the ORM refuses to do
+    # on the event loop; resolve it up front so templates and context
+    # processors get the real user.
+    request.user = await request.auser()
+    return request.user
+
+
+async def load_unread_count(request):
+    # Read by events.context_processors.notifications.
+    if request.user.is_authenticated:
+        request._unread_notifications_count = await aget_unread_count(request.user)
+
+
+async def alist(queryset):
+    return [obj async for obj in queryset.aiterator()]
+
+
+async def load_recommendations(user, limit=6):
+    # Recommendations come from the tickets a user holds, so only
+    # attendees get them.
+    if not user.is_authenticated or user.user_type != 1:
+        return []
+    return await alist(Event.objects.recommended_for(user)[:limit])
+
+
+def render_async(view, context):
+    # The handler would render a TemplateResponse in a worker thread; render
+    # on the event loop instead. Everything the template touches has to be
+    # fetched beforehand, since a query from here raises.
+    return render(view.request, view.get_template_names(), context)
+
+
+def page_etag(request, *parts):
+    # Weak, since the CSRF token differs on every render. Signed-in pages
+    # also depend on who is looking and on their unread count.
+    user = request.user
+    if user.is_authenticated:
+        parts += (user.pk, getattr(request, '_unread_notifications_count', None))
+    return f'W/"{hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()}"'
+
+
+async def has_pending_messages(request):
+    # Messages are kept in a cookie, or in the session when they overflow
+    # it; without either there can be none.
+    if not request.COOKIES.keys() & {CookieStorage.cookie_name, settings.SESSION_COOKIE_NAME}:
+        return False
+    # The session loads synchronously.
+    return bool(await sync_to_async(len)(messages.get_messages(request)))
+
+
+async def not_modified(request, etag, last_modified=None):
+    # A 304 when the client's copy is still current, decided before anything
+    # is rendered. Pending messages are only shown by rendering the page.
+    if 'If-None-Match' not in request.headers and 'If-Modified-Since' not in request.headers:
+        return None
+    if await has_pending_messages(request):
+        return None
+    if request.user.is_authenticated:
+        last_modified = None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(request, response, etag, last_modified=None):
+    authenticated = request.user.is_authenticated
+    patch_cache_control(response, no_cache=True, private=authenticated)
+    if getattr(messages.get_messages(request), 'used', False):
+        # A copy showing messages must not be revalidated and shown again.
+        return response
+    response['ETag'] = etag
+    # A date cannot tell one signed-in user's page from another's.
+    if last_modified and not authenticated:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    async def dispatch(self, request, *args, **kwargs):
+        if not (await load_user(request)).is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+
 
 class HomeView(TemplateView):
     template_name = 'events/index.html'
     
     async def get(self, request, *args, **kwargs):
-        context = await self.get_context_data(**kwargs)
-        return self.render_to_response(context)
-    
-    async def get_context_data(self, **kwargs):
-        context = await sync_to_async(super().get_context_data)(**kwargs)
-        context['upcoming_events'] = await self.get_upcoming_events()
-        return context
-    
-    @sync_to_async
-    def get_upcoming_events(self):
-        return list(Event.objects.filter(
-            start_date__gt=timezone.now(),
-            is_active=True
-        ).order_by('start_date')[:6])
-
-
-class EventListView(ListView):
+        await load_user(request)
+        upcoming_events, recommended_events, _ = await asyncio.gather(
+            alist(Event.objects.filter(
+                start_date__gt=timezone.now(),
+                is_active=True
+            ).order_by('start_date')[:6]),
+            load_recommendations(request.user),
+            load_unread_count(request),
+        )
+        # The cards show nothing that changes without a save(), so
+        # updated_at is enough here. No Last-Modified: an event dropping out
+        # of the list leaves the newest date as it was.
+        etag = page_etag(request, 'home', *(
+            [(event.pk, event.updated_at) for event in events] for events in (upcoming_events, recommended_events)
+        ))
+        response = await not_modified(request, etag)
+        if response is None:
+            context = self.get_context_data(**kwargs)
+            context['upcoming_events'] = upcoming_events
+            context['recommended_events'] = recommended_events
+            response = render_async(self, context)
+        return set_validators(request, response, etag)
+
+
+class EventListView(CursorPaginationMixin, ListView):
     model = Event
     template_name = 'events/event_list.html'
     context_object_name = 'events'
     paginate_by = 9
+
+    def use_cursor_pagination(self):
+        # Search results are ordered by relevance, which has no stable key.
+        return not self.request.GET.get('search') and super().use_cursor_pagination()
     
     def get_queryset(self):
-        queryset = Event.objects.filter(is_active=True, start_date__gt=timezone.now())
+        queryset = Event.objects.filter(is_active=True, start_date__gt=timezone.now()).select_related('category')
         category = self.request.GET.get('category')
         if category:
             queryset = queryset.filter(category__name=category)
         
-        search_query = self.request.GET.get('search')
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(location__icontains=search_query)
-            )
-
         if not self.request.user.is_authenticated:
             queryset = queryset.filter(event_type='public')
+
+        search_query = self.request.GET.get('search')
+        if search_query:
+            return get_search_backend().search(queryset, search_query)
         
         return queryset.order_by('start_date')
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['categories'] = EventCategory.objects.all()
-        return context
+
+    async def get(self, request, *args, **kwargs):
+        await load_user(request)
+        if request.GET.get('search'):
+            # The search backend may create its index on first use.
+            self.object_list = await sync_to_async(self.get_queryset)()
+        else:
+            self.object_list = self.get_queryset()
+        context, categories, _ = await asyncio.gather(
+            self.aget_context_data(),
+            alist(EventCategory.objects.all()),
+            load_unread_count(request),
+        )
+        # The page is validated by its own rows, as on the home page, so a
+        # 304 costs no query beyond the page itself.
+        page = context['page_obj']
+        etag = page_etag(
+            request, 'event_list',
+            [(event.pk, event.changed_at) for event in page.object_list],
+            page.has_previous(), page.has_next(), getattr(page, 'number', None),
+            getattr(context['paginator'], 'num_pages', None),
+            [(category.pk, category.name) for category in categories]
+        )
+        response = await not_modified(request, etag)
+        if response is None:
+            context['categories'] = categories
+            response = render_async(self, context)
+        return set_validators(request, response, etag)
+
+
+COMMENTS_PER_PAGE = 10
+
+
+async def load_comments(event, cursor=None):
+    # Newest first, one keyset page at a time; the rest load on scroll
+    # from event_comments.
+    paginator = CursorPaginator(event.comments.select_related('user'), COMMENTS_PER_PAGE, ('-created_at', '-pk'))
+    try:
+        return await paginator.apage(cursor)
+    except InvalidCursor:
+        raise Http404("Invalid cursor.")
+
+
+async def event_comments(request, pk):
+    user = await load_user(request)
+    try:
+        event = await Event.objects.only('pk', 'event_type', 'changed_at').aget(pk=pk)
+    except Event.DoesNotExist:
+        raise Http404("No event found matching the query.")
+    if event.event_type == 'private' and not user.is_authenticated:
+        raise PermissionDenied
+    await load_unread_count(request)
+
+    cursor = request.GET.get('cursor')
+    etag = page_etag(request, 'event_comments', event.pk, event.changed_at, cursor)
+    response = await not_modified(request, etag)
+    if response is None:
+        comments = await load_comments(event, cursor)
+        response = render(request, 'events/comment_list.html', {'event': event, 'comments': comments})
+    return set_validators(request, response, etag)
 
 
 class EventDetailView(DetailView):
     model = Event
     template_name = 'events/event_detail.html'
     context_object_name = 'event'
+
+    def get_queryset(self):
+        return Event.objects.select_related('organizer', 'category')
+
+    async def aget_object(self):
+        try:
+            return await self.get_queryset().aget(pk=self.kwargs['pk'])
+        except Event.DoesNotExist:
+            raise Http404("No event found matching the query.")
+
+    async def get(self, request, *args, **kwargs):
+        await load_user(request)
+        self.object, _ = await asyncio.gather(self.aget_object(), load_unread_count(request))
+        etag = page_etag(request, 'event_detail', self.object.pk, self.object.changed_at)
+        last_modified = int(self.object.changed_at.timestamp())
+        response = await not_modified(request, etag, last_modified)
+        if response is None and await self.is_shared_page():
+            content = await cached_page(
+                f'event-detail:{self.object.pk}', self.object.changed_at.isoformat(), self.build_page
+            )
+            if content is not None:
+                response = HttpResponse(content)
+        if response is None:
+            response = await self.render_page()
+        return set_validators(request, response, etag, last_modified)
+
+    async def is_shared_page(self):
+        # Anonymous visitors all get the same public event page.
+        return (
+            not self.request.user.is_authenticated
+            and self.object.event_type == 'public'
+            and not await has_pending_messages(self.request)
+        )
+
+    async def render_page(self):
+        context = await self.aget_context_data(object=self.object)
+        return render_async(self, context)
+
+    async def build_page(self):
+        response = await self.render_page()
+        # A page holding a CSRF token belongs to one visitor.
+        if self.request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            return None
+        return response.content
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        event = self.get_object()
+    async def aget_context_data(self, **kwargs):
+        context = self.get_context_data(**kwargs)
+        event = self.object
+        user = self.request.user
         
-        if event.event_type == 'private' and not self.request.user.is_authenticated:
+        if event.event_type == 'private' and not user.is_authenticated:
             context['access_denied'] = True
             return context
         
         context['access_denied'] = False
-        context['comments'] = event.comments.all().order_by('-created_at')
         context['comment_form'] = EventCommentForm()
         context['event'] = event
         
-        if self.request.user.is_authenticated:
-            context['has_ticket'] = event.tickets.filter(
-                attendee=self.request.user,
-                is_active=True
-            ).exists()
-            context['ticket_form'] = TicketPurchaseForm(event=event, user=self.request.user)
+        comments = load_comments(event)
+        if user.is_authenticated:
+            context['comments'], context['has_ticket'] = await asyncio.gather(
+                comments,
+                event.tickets.filter(attendee=user, is_active=True).aexists(),
+            )
+            context['ticket_form'] = TicketPurchaseForm(event=event, user=user)
+        else:
+            context['comments'] = await comments
         
         return context
     
-    def post(self, request, *args, **kwargs):
-        if not request.user.is_authenticated:
+    async def post(self, request, *args, **kwargs):
+        if not (await load_user(request)).is_authenticated:
             return redirect('login')
         
-        event = self.get_object()
+        event = await self.aget_object()
         form = EventCommentForm(request.POST)
         
         if form.is_valid():
             comment = form.save(commit=False)
             comment.event = event
             comment.user = request.user
-            comment.save()
+            await comment.asave()
             messages.success(request, 'Your comment has been posted.')
         else:
             messages.error(request, 'There was an error posting your comment.')
@@ -131,13 +350,23 @@ class EventCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
         return super().form_valid(form)
 
 
-class MyEventsListView(LoginRequiredMixin, ListView):
+class MyEventsListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Event
     template_name = 'events/my_events.html'
     context_object_name = 'events'
+    paginate_by = 12
+    cursor_ordering = ('-start_date', '-pk')
     
     def get_queryset(self):
-        return Event.objects.filter(organizer=self.request.user).order_by('-start_date')
+        return Event.objects.filter(organizer=self.request.user).select_related('category').order_by('-start_date', '-pk')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['active_jobs'] = Job.objects.filter(
+            created_by=self.request.user,
+            status__in=['pending', 'running']
+        ).order_by('created_at')
+        return context
     
 
 class EventUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
@@ -152,6 +381,18 @@ class EventUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def get_success_url(self):
         return reverse_lazy('event_detail', kwargs={'pk': self.object.pk})
 
+    def form_valid(self, form):
+        changes = {
+            field: (describe_value(form.initial[field]), describe_value(form.cleaned_data[field]))
+            for field in Event.MATERIAL_FIELDS
+            if form.initial.get(field) != form.cleaned_data.get(field)
+        }
+        with transaction.atomic():
+            response = super().form_valid(form)
+            if changes and self.object.is_active:
+                enqueue_event_update(self.object, changes, created_by=self.request.user)
+        return response
+
 
 class EventDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     model = Event
@@ -163,23 +404,214 @@ class EventDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         print(event)
         return self.request.user == event.organizer or self.request.user.user_type == 3
     
+    def form_valid(self, form):
+        # Cancelling is a soft delete; never drop the row and its tickets.
+        return self.delete(self.request)
+
     def delete(self, request, *args, **kwargs):
         event = self.get_object()
-        event.is_active = False
-        event.save()
-        
-        for ticket in event.tickets.filter(is_active=True):
-            Notification.objects.create(
-                user=ticket.attendee,
-                notification_type='event_cancellation',
-                message=f"The event '{event.title}' has been cancelled.",
-                related_event=event
-            )
+        with transaction.atomic():
+            event.is_active = False
+            event.save()
+            enqueue('event_cancellation', created_by=request.user, event_id=event.pk)
         
-        messages.success(request, 'Event has been cancelled.')
+        messages.success(request, 'Event has been cancelled. Attendees are being notified.')
         return redirect(self.get_success_url())
 
 
+def _export_format(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise Http404("Unknown export format.")
+    return export_format
+
+
+@login_required
+def export_event_attendees(request, pk):
+    event = get_object_or_404(Event, pk=pk)
+    if request.user.pk != event.organizer_id and request.user.user_type != 3:
+        raise PermissionDenied
+    return streaming_export(
+        export_tickets(event=event),
+        _export_format(request),
+        f"event-{event.pk}-attendees",
+        asgi=isinstance(request, ASGIRequest)
+    )
+
+
+@login_required
+def export_my_events_attendees(request):
+    if request.user.user_type not in [2, 3]:
+        raise PermissionDenied
+    return streaming_export(
+        export_tickets(event__organizer=request.user),
+        _export_format(request),
+        f"{request.user.username}-attendees",
+        asgi=isinstance(request, ASGIRequest)
+    )
+
+
+AVAILABILITY_FIELDS = ('capacity', 'tickets_sold', 'is_active')
+# A stream is closed after this many seconds and EventSource reconnects
+# RECONNECT_DELAY ms later; under WSGI there is no stream, so that is also
+# how often it polls.
+STREAM_DURATION = 300
+RECONNECT_DELAY = 3000
+WSGI_RECONNECT_DELAY = 10000
+
+
+def availability_payload(values):
+    if values is None:
+        return {'available': 0, 'capacity': 0, 'is_active': False}
+    return {
+        'available': max(values['capacity'] - values['tickets_sold'], 0),
+        'capacity': values['capacity'],
+        'is_active': values['is_active'],
+    }
+
+
+async def read_availability(event_id):
+    return availability_payload(
+        await Event.objects.filter(pk=event_id).values(*AVAILABILITY_FIELDS).afirst()
+    )
+
+
+async def availability_events(event_id, current):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_DURATION
+    yield f'retry: {RECONNECT_DELAY}\n\n'
+    yield sse_message(current, event='availability')
+    async with availability_hub.subscribe(event_id) as subscription:
+        async for value in subscription.values(read_availability, KEEPALIVE_INTERVAL):
+            if value is None:
+                # Read on every keepalive tick too: sales, cancellations and
+                # job runs in another process don't reach a local broker.
+                value = await read_availability(event_id)
+                if value == current:
+                    yield ': keepalive\n\n'
+            if value != current:
+                current = value
+                yield sse_message(current, event='availability')
+            if loop.time() >= deadline:
+                break
+
+
+async def event_availability(request, pk):
+    user = await load_user(request)
+    event = await Event.objects.filter(pk=pk).values('event_type', *AVAILABILITY_FIELDS).afirst()
+    if event is None:
+        raise Http404("No event found matching the query.")
+    if event['event_type'] == 'private' and not user.is_authenticated:
+        raise PermissionDenied
+    current = availability_payload(event)
+
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(availability_events(pk, current), content_type='text/event-stream')
+    else:
+        # A WSGI worker can't be held open for a stream; send the current
+        # value and let EventSource poll.
+        response = HttpResponse(
+            f'retry: {WSGI_RECONNECT_DELAY}\n\n' + sse_message(current, event='availability'),
+            content_type='text/event-stream'
+        )
+    response['Cache-Control'] = 'no-cache'
+    # Stops nginx buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Notifications sent per read; a stream reads again straight away after a
+# full batch.
+NOTIFICATION_BATCH = 50
+
+
+def notification_payload(notification, unread_count):
+    return {
+        'id': notification.pk,
+        'type': notification.notification_type,
+        'title': notification.get_notification_type_display(),
+        'message': notification.message,
+        'created_at': notification.created_at.isoformat(),
+        'event_url': (
+            reverse('event_detail', args=[notification.related_event_id])
+            if notification.related_event_id else None
+        ),
+        'unread_count': unread_count,
+    }
+
+
+async def notification_messages(user, after):
+    notifications = await alist(user.notifications.filter(pk__gt=after).order_by('pk')[:NOTIFICATION_BATCH])
+    if not notifications:
+        return [], after
+    unread_count = await aget_unread_count(user)
+    return [
+        sse_message(notification_payload(notification, unread_count), event='notification', id=notification.pk)
+        for notification in notifications
+    ], notifications[-1].pk
+
+
+async def notification_events(user, after):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_DURATION
+    yield f'retry: {RECONNECT_DELAY}\nid: {after}\n\n'
+    async with get_notification_broker().subscribe(user.pk) as subscription:
+        changed = True
+        while loop.time() < deadline:
+            # Read on every keepalive tick too: notifications created in
+            # another process don't reach a local broker.
+            lines, after = await notification_messages(user, after)
+            for line in lines:
+                yield line
+            if len(lines) == NOTIFICATION_BATCH:
+                continue
+            if not lines and not changed:
+                yield ': keepalive\n\n'
+            changed = await subscription.wait(KEEPALIVE_INTERVAL)
+
+
+async def notification_stream(request):
+    user = await load_user(request)
+    if not user.is_authenticated:
+        raise PermissionDenied
+    # EventSource sends the id of the last message it saw when it reconnects.
+    cursor = request.headers.get('Last-Event-ID') or request.GET.get('after')
+    try:
+        after = int(cursor)
+    except (TypeError, ValueError):
+        after = await user.notifications.order_by('-pk').values_list('pk', flat=True).afirst() or 0
+
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(notification_events(user, after), content_type='text/event-stream')
+    else:
+        lines, after = await notification_messages(user, after)
+        response = HttpResponse(
+            f'retry: {WSGI_RECONNECT_DELAY}\nid: {after}\n\n' + ''.join(lines),
+            content_type='text/event-stream'
+        )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("No such file.")
+    return file_response(request, full_path, path, immutable=path.startswith(f'{DERIVATIVE_DIR}/'))
+
+
+def image_derivative(request, digest, width):
+    if width not in DERIVATIVE_WIDTHS or not re.fullmatch(r'[0-9a-f]{64}', digest):
+        raise Http404("No such image.")
+    path = get_derivative(digest, width)
+    if path is None:
+        raise Http404("No such image.")
+    # The URL names the content, so it never changes.
+    return file_response(request, path, derivative_name(digest, width), immutable=True)
+
+
 @login_required
 def purchase_ticket(request, pk):
     event = get_object_or_404(Event, pk=pk)
@@ -190,22 +622,27 @@ def purchase_ticket(request, pk):
         if form.is_valid():
             quantity = form.cleaned_data['quantity']
             
-            for _ in range(quantity):
-                ticket = Ticket.objects.create(
-                    event=event,
-                    attendee=request.user,
-                    is_active=True
-                )
-            
-            Notification.objects.create(
-                user=request.user,
-                notification_type='ticket_confirmation',
-                message=f"Your ticket(s) for '{event.title}' have been confirmed.",
-                related_event=event
-            )
-            
-            messages.success(request, f'Successfully purchased {quantity} ticket(s) for {event.title}.')
-            return redirect('user_dashboard')
+            try:
+                with transaction.atomic():
+                    Ticket.objects.purchase(event, request.user, quantity)
+                    Notification.objects.create(
+                        user=request.user,
+                        notification_type='ticket_confirmation',
+                        message=f"Your ticket(s) for '{event.title}' have been confirmed.",
+                        related_event=event
+                    )
+            except ValidationError as e:
+                form.add_error('quantity', e)
+            except IntegrityError:
+                # Rolled back with the reservation, so nothing was sold.
+                form.add_error(None, "Your tickets could not be issued. Please try again.")
+            except ImproperlyConfigured:
+                # No ticket number node id could be had; rolled back likewise.
+                logger.exception("Ticket numbers for event %s could not be generated", event.pk)
+                form.add_error(None, "Your tickets could not be issued. Please try again.")
+            else:
+                messages.success(request, f'Successfully purchased {quantity} ticket(s) for {event.title}.')
+                return redirect('user_dashboard')
     else:
         form = TicketPurchaseForm(event=event, user=request.user)
     
@@ -215,32 +652,38 @@ def purchase_ticket(request, pk):
     })
 
 
-class UserDashboardView(LoginRequiredMixin, TemplateView):
+class UserDashboardView(AsyncLoginRequiredMixin, TemplateView):
     template_name = 'events/user_dashboard.html'
+
+    async def get(self, request, *args, **kwargs):
+        context = await self.aget_context_data(**kwargs)
+        return render_async(self, context)
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    async def aget_context_data(self, **kwargs):
+        context = self.get_context_data(**kwargs)
         user = self.request.user
+        now = timezone.now()
         
+        # One query per role; the past/upcoming split happens in Python.
         if user.user_type == 1:  # Attendee
-            context['upcoming_events'] = Event.objects.filter(
-                tickets__attendee=user,
-                tickets__is_active=True,
-                start_date__gt=timezone.now()
-            ).distinct()
-            context['past_events'] = Event.objects.filter(
-                tickets__attendee=user,
-                tickets__is_active=True,
-                start_date__lte=timezone.now()
-            ).distinct()
+            events = Event.objects.attended_by(user).order_by('start_date', 'pk')
         elif user.user_type == 2:  # Organizer
-            context['organized_events'] = user.organized_events.filter(is_active=True)
-            context['past_events'] = user.organized_events.filter(
-                is_active=True,
-                start_date__lte=timezone.now()
-            )
-        
-        context['unread_notifications'] = user.notifications.filter(is_read=False)
+            events = user.organized_events.filter(is_active=True).with_stats().order_by('start_date', 'pk')
+        else:
+            events = Event.objects.none()
+        events, context['unread_notifications'], context['recommended_events'], _ = await asyncio.gather(
+            alist(events),
+            alist(user.notifications.filter(is_read=False).order_by('-created_at')),
+            load_recommendations(user),
+            load_unread_count(self.request),
+        )
+
+        if user.user_type == 1:
+            context['upcoming_events'] = [event for event in events if event.start_date > now]
+            context['past_events'] = [event for event in reversed(events) if event.start_date <= now]
+        elif user.user_type == 2:
+            context['organized_events'] = events
+            context['past_events'] = [event for event in reversed(events) if event.start_date <= now]
         return context
 
 
@@ -308,13 +751,23 @@ class ProfileUpdateView(LoginRequiredMixin, UpdateView):
         return super().form_invalid(form)
     
 
-class UserTicketsView(LoginRequiredMixin, ListView):
+class UserTicketsView(AsyncLoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Ticket
     template_name = 'events/user_tickets.html'
     context_object_name = 'tickets'
+    paginate_by = 20
+    cursor_ordering = ('event__start_date', 'pk')
 
     def get_queryset(self):
-        return Ticket.objects.filter(attendee=self.request.user, is_active=True)
+        return Ticket.objects.filter(
+            attendee=self.request.user,
+            is_active=True
+        ).select_related('event').order_by('event__start_date', 'pk')
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        context, _ = await asyncio.gather(self.aget_context_data(), load_unread_count(request))
+        return render_async(self, context)
 
 
 class CommentUpdateView(LoginRequiredMixin, UpdateView):
@@ -365,8 +818,8 @@ class CustomLogoutView(LogoutView):
 @login_required
 def mark_notification_as_read(request, pk):
     notification = get_object_or_404(Notification, pk=pk, user=request.user)
-    notification.is_read = True
-    notification.save()
+    if Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True):
+        adjust_unread_count(request.user.pk, -1)
     return redirect('user_dashboard')
 
 
@@ -378,18 +831,49 @@ class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_events'] = Event.objects.count()
-        context['total_users'] = CustomUser.objects.count()
-        context['recent_events'] = Event.objects.order_by('-created_at')[:5]
+        stats = get_platform_stats()
+        context['stats'] = stats
+        context['daily_stats'] = get_daily_stats()
+        context['total_events'] = stats['events_total']
+        context['total_users'] = stats['users_total']
+        context['recent_events'] = Event.objects.select_related('organizer').order_by('-created_at')[:5]
         context['recent_users'] = CustomUser.objects.order_by('-date_joined')[:5]
+        context['card_cache'] = get_card_cache_stats()
+        return context
+
+
+class AdminEventManagementView(AdminDashboardView):
+    template_name = 'events/admin/event_management.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        stats = context['stats']
+        context['upcoming_events'] = stats['upcoming_events']
+        context['past_events'] = stats['past_events']
+        context['active_events'] = stats['events_active']
+        return context
+
+
+class AdminUserManagementView(AdminDashboardView):
+    template_name = 'events/admin/user_management.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        stats = context['stats']
+        context['attendee_count'] = stats[user_type_key(1)]
+        context['organizer_count'] = stats[user_type_key(2)]
+        context['admin_count'] = stats[user_type_key(3)]
+        context['recent_users_list'] = context['recent_users']
+        context['recent_users'] = stats['users_joined_last_week']
         return context
     
 
-class MarkAllNotificationsAsReadView(View):
+class MarkAllNotificationsAsReadView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         unread_notifications = Notification.objects.filter(
             user=request.user,
             is_read=False
         )
         unread_notifications.update(is_read=True)
+        invalidate_unread_counts([request.user.pk])
         return redirect('user_dashboard')
\ No newline at end of file